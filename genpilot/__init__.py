@@ -1,6 +1,45 @@
-from .abc.agent import IAgent
-from .abc.memory import IMemory
-from .abc.chat import IChat
-from .agent.default_agent import Agent
-from .chat.terminal_chat import TerminalChat, ActionPermission
-from .memory.buffer_memory import BufferMemory
+import importlib
+from typing import TYPE_CHECKING
+
+# the public API is loaded on first use, so `import genpilot` doesn't pull in the
+# chat front-ends, litellm or the MCP client before they are needed
+_LAZY_ATTRIBUTES = {
+    "IAgent": ".abc.agent",
+    "IMemory": ".abc.memory",
+    "IChat": ".abc.chat",
+    "Agent": ".agent.default_agent",
+    "TerminalChat": ".chat.terminal_chat",
+    "ActionPermission": ".chat.terminal_chat",
+    "BufferMemory": ".memory.buffer_memory",
+    "TokenBufferMemory": ".memory.token_buffer_memory",
+    "SummaryBufferMemory": ".memory.summary_buffer_memory",
+}
+
+_SUBMODULES = {"abc", "agent", "chat", "mcp", "memory", "tools", "utils"}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .abc.agent import IAgent
+    from .abc.memory import IMemory
+    from .abc.chat import IChat
+    from .agent.default_agent import Agent
+    from .chat.terminal_chat import TerminalChat, ActionPermission
+    from .memory.buffer_memory import BufferMemory
+    from .memory.token_buffer_memory import TokenBufferMemory
+    from .memory.summary_buffer_memory import SummaryBufferMemory
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
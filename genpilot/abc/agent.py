@@ -2,8 +2,8 @@ from abc import ABC, abstractmethod
 from enum import Enum
 import typing
 from typing_extensions import Literal, Required, TypedDict, Optional
-from typing import Union, List, Dict
-from dataclasses import dataclass
+from typing import Callable, Union, List, Dict
+from dataclasses import dataclass, field
 
 from openai.types.chat import (
     ChatCompletionMessageParam,
@@ -37,6 +37,38 @@ class ModelConfig(TypedDict, total=False):
     config: dict[str, any] = {}
 
 
+@dataclass
+class CacheUsage:
+    """The prompt tokens and the provider cached ones of the agent requests."""
+
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cache_creation_tokens: int = 0
+
+    def update(self, usage):
+        """Accumulates the usage of a litellm response."""
+        if not usage:
+            return
+        self.requests += 1
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        # openai style details, or the anthropic style fields
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) if details else None
+        if cached_tokens is None:
+            cached_tokens = getattr(usage, "cache_read_input_tokens", 0)
+        self.cached_tokens += cached_tokens or 0
+        self.cache_creation_tokens += (
+            getattr(usage, "cache_creation_input_tokens", 0) or 0
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+
 @dataclass
 class Attribute:
     name: str
@@ -47,6 +79,9 @@ class Attribute:
     model_config: dict = None  # Default value to empty dict
     permission: ActionPermission = ActionPermission.ALWAYS
     human_on_loop: bool = True
+    # place the prompt cache breakpoints for the providers supporting them
+    prompt_cache: bool = False
+    cache_usage: CacheUsage = field(default_factory=CacheUsage)
 
     def __post_init__(self):
         if self.model_config is None:
@@ -84,3 +119,28 @@ def final_answer(answer_content: str):
         answer_content (str): The final answer content for the latest task or issue.
     """
     return answer_content
+
+
+def side_effect_free(func: Callable = None, *, when: Callable[[dict], bool] = None):
+    """
+    Marks the tool as side-effect free, so it can be invoked speculatively while the
+    model is still streaming the rest of its message.
+
+    Parameters:
+        func (Callable): The tool function.
+        when (Callable[[dict], bool], optional): Decides it per call by the tool
+            arguments, e.g. only for the read commands.
+    """
+
+    def mark(f):
+        f.side_effect_free = when or True
+        return f
+
+    return mark(func) if func else mark
+
+
+def is_side_effect_free(func: Callable, func_args: dict) -> bool:
+    marker = getattr(func, "side_effect_free", False)
+    if callable(marker):
+        return bool(marker(func_args))
+    return bool(marker)
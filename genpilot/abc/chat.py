@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Union, List
+from typing import Callable, Union, List
 
 from openai.types.chat import (
     ChatCompletionMessage,
@@ -39,13 +39,20 @@ class IChat(ABC):
 
     @abstractmethod
     async def reasoning(
-        self, agent: IAgent, tool_schemas: List
+        self,
+        agent: IAgent,
+        tool_schemas: List,
+        on_tool_call: Callable[[ChatCompletionMessageToolCall], None] = None,
     ) -> ChatCompletionAssistantMessageParam:
         """
         Facilitates interaction with the LLM model via the LLM client.
 
         Args:
             agent (IAgent): The agent to reason with the LLM model.
+            tool_schemas (List): The schemas of the tools the model may call.
+            on_tool_call (Callable, optional): Called with each tool call once its
+                arguments are complete, before the rest of the stream finishes, e.g. to
+                start the side-effect free ones early. Ignoring it is fine.
         """
         pass
 
@@ -1,5 +1,8 @@
+import asyncio
+import inspect
 import json
-from typing import Callable, List, Dict, Union
+import time
+from typing import Callable, List, Dict, Tuple, Union
 from openai.types.chat import (
     ChatCompletionMessage,
     ChatCompletionMessageParam,
@@ -10,19 +13,25 @@ from openai.types.chat import (
     ChatCompletionAssistantMessageParam,
     ChatCompletionMessageToolCall,
 )
-import genpilot as gp
 from genpilot.abc.agent import (
     ActionPermission,
     ActionType,
     Attribute,
     final_answer,
     ModelConfig,
+    is_side_effect_free,
 )
 from genpilot.utils.function_to_schema import func_to_param, function_to_schema
 from genpilot.utils.mcp_server_config import AppConfig, McpServerConfig
 from genpilot.tools.mcp_toolkit import McpToolkit
+from genpilot.mcp.session import start_session
+from genpilot.mcp.result_cache import ToolResultCache, cached_call_tool
+from genpilot.mcp.tool_result import tool_result_text
+from genpilot.mcp.supervisor import SessionSupervisor, is_replayable
+from genpilot.mcp.registry import MCPRegistry, SharedServer
 from ..abc.agent import IAgent
 from ..abc.memory import IMemory
+from ..memory.buffer_memory import BufferMemory
 from ..abc.chat import IChat
 from rich.console import Console
 from rich.table import Table
@@ -51,6 +60,11 @@ class Agent(IAgent):
         action_permission: ActionPermission = ActionPermission.ALWAYS,
         human_on_loop: bool = True,
         terminal_func: Callable = final_answer,
+        max_parallel_actions: int = 1,
+        prompt_cache: bool = False,
+        speculative_actions: bool = False,
+        mcp_supervisor: SessionSupervisor = None,
+        share_mcp_servers: bool = False,
     ):
         self._attribute = Attribute(
             name,
@@ -59,6 +73,7 @@ class Agent(IAgent):
             description=description or system,
             permission=action_permission,
             human_on_loop=human_on_loop,
+            prompt_cache=prompt_cache,
         )
         self.chat = chat
 
@@ -73,23 +88,60 @@ class Agent(IAgent):
 
         self.toolkits: Dict[str, McpToolkit] = {}
         self.toolkits_schemas = []
+        # the assembled tool schemas, rebuilt only when the tools change
+        self._tool_schemas: Tuple[dict, ...] = None
 
         # TODO: give a default chat console
         self._attribute.memory = (
-            memory if memory is not None else gp.memory.BufferMemory(size=10)
+            memory if memory is not None else BufferMemory(size=10)
         )
         self._attribute.memory.add(
             ChatCompletionSystemMessageParam(content=system, role="system", name=name)
         )
 
         self._max_iter = max_iter
+        # the max tool calls of one assistant message acting at the same time,
+        # 1 means acting them one by one
+        self._max_parallel_actions = max(1, max_parallel_actions)
+        # start the side-effect free tool calls while the model is still streaming,
+        # keyed by the call to pick up their results when acting
+        self._speculative_actions = speculative_actions
+        self._speculative_tasks: Dict[Tuple[str, str], List[asyncio.Task]] = {}
         self.mcp_server_config = mcp_server_config
         self.exit_stack = AsyncExitStack()
+        # the results of the cacheable MCP tools, configured per server
+        self.tool_result_cache = ToolResultCache()
+        # restarts a dead MCP server alone and retries its calls, if given
+        self.mcp_supervisor = mcp_supervisor
+        # share the MCP server processes with the other agents of the process, by the
+        # toolkit name, instead of starting them for this agent
+        self._share_mcp_servers = share_mcp_servers
+        self._shared_servers: Dict[str, SharedServer] = {}
+        # the callbacks of the agent on the shared servers, detached once released
+        self._shared_callbacks: Dict[str, Tuple[Callable, Callable]] = {}
 
     @property
     def attribute(self) -> Attribute:
         return self._attribute
 
+    @property
+    def tool_schemas(self) -> Tuple[dict, ...]:
+        """
+        The schemas of the functions, handoff agents and MCP tools, assembled once and
+        shared by the requests until the tools change, as a tuple so it can't be
+        changed in place.
+        """
+        if self._tool_schemas is None:
+            self._tool_schemas = tuple(
+                self.function_schemas + self.agent_schemas + self.toolkits_schemas
+            )
+        return self._tool_schemas
+
+    def invalidate_tool_schemas(self):
+        """Rebuilds the tool schemas on the next request, call it after changing the
+        functions, agents or toolkits."""
+        self._tool_schemas = None
+
     async def chatbot(self):
         print()
         while True:
@@ -108,14 +160,21 @@ class Agent(IAgent):
         i = 0
         while i == 0 or i < self._max_iter:
             # 2. reasoning -> return none indicate try again
-            tool_schemas = (
-                self.function_schemas + self.agent_schemas + self.toolkits_schemas
-            )
-            assistant_message: ChatCompletionAssistantMessageParam = (
-                await self.chat.reasoning(agent=self, tool_schemas=tool_schemas)
-            )
+            if self._speculative_actions:
+                assistant_message: ChatCompletionAssistantMessageParam = (
+                    await self.chat.reasoning(
+                        agent=self,
+                        tool_schemas=self.tool_schemas,
+                        on_tool_call=self.speculate,
+                    )
+                )
+            else:
+                assistant_message: ChatCompletionAssistantMessageParam = (
+                    await self.chat.reasoning(agent=self, tool_schemas=self.tool_schemas)
+                )
 
             if assistant_message is None:
+                self.cancel_speculations()
                 # input return false, means exiting
                 if not self.chat.input(self, message):
                     self._attribute.memory.clear()
@@ -130,38 +189,28 @@ class Agent(IAgent):
                 or assistant_message["tool_calls"] is None
             ):
                 # self._attribute.memory.clear()
+                self.cancel_speculations()
                 return assistant_message
 
             # 3. acting
-            for tool_call in assistant_message["tool_calls"]:
-                func_name = tool_call["function"]["name"]
-                func_args = tool_call["function"]["arguments"]
-                tool_call_id = tool_call["id"]
-                if isinstance(func_args, str):
-                    func_args = json.loads(func_args)
-
-                # validate
-                action_type = ActionType.NONE
-                if func_name in self.functions:
-                    action_type = ActionType.FUNCTION
-                if func_name in self.agents:
-                    action_type = ActionType.AGENT
-                if func_name in self.toolkits:
-                    action_type = ActionType.SERVER
-
-                if action_type == ActionType.NONE:
-                    raise ValueError(f"The '{func_name}' isn't registered!")
-
-                func_result = await self.chat.acting(
-                    self, action_type, func_name, func_args
-                )
-
-                # add tool call result
+            actions = [
+                self.parse_tool_call(tool_call)
+                for tool_call in assistant_message["tool_calls"]
+            ]
+            try:
+                func_results = await self.acting(actions)
+            finally:
+                self.cancel_speculations()
+
+            # add tool call results in the original tool call order
+            for (tool_call_id, func_name, _, _), func_result in zip(
+                actions, func_results
+            ):
                 self._attribute.memory.add(
                     ChatCompletionToolMessageParam(
                         tool_call_id=tool_call_id,
                         # tool_name=tool_call.function.name, # tool name is not supported by groq client now
-                        content=f"{func_result}",
+                        content=self.tool_message_content(func_name, func_result),
                         role="tool",
                         name=func_name,
                     )
@@ -172,7 +221,118 @@ class Agent(IAgent):
             self._attribute.memory.clear()
             return f"Reached maximum iterations: {self._max_iter}!"
 
+    def parse_tool_call(self, tool_call) -> Tuple[str, str, dict, ActionType]:
+        """
+        Resolve the tool call of the assistant message into the action to take.
+
+        Returns:
+            tuple: (tool_call_id, func_name, func_args, action_type)
+        """
+        func_name = tool_call["function"]["name"]
+        func_args = tool_call["function"]["arguments"]
+        if isinstance(func_args, str):
+            func_args = json.loads(func_args)
+
+        # validate
+        action_type = ActionType.NONE
+        if func_name in self.functions:
+            action_type = ActionType.FUNCTION
+        if func_name in self.agents:
+            action_type = ActionType.AGENT
+        if func_name in self.toolkits:
+            action_type = ActionType.SERVER
+
+        if action_type == ActionType.NONE:
+            raise ValueError(f"The '{func_name}' isn't registered!")
+        return tool_call["id"], func_name, func_args, action_type
+
+    async def acting(self, actions: List[Tuple[str, str, dict, ActionType]]) -> List:
+        """
+        Invoke the actions through the chat and return their results in order.
+
+        With max_parallel_actions > 1, the function and server tool calls run
+        concurrently under that limit, while the agent handoffs still run one by
+        one since they take over the conversation. The permission prompts are
+        left to the chat.
+        """
+        if self._max_parallel_actions == 1 or len(actions) == 1:
+            return [
+                await self.chat.acting(self, action_type, func_name, func_args)
+                for _, func_name, func_args, action_type in actions
+            ]
+
+        results = [None] * len(actions)
+        semaphore = asyncio.Semaphore(self._max_parallel_actions)
+
+        async def act(index: int):
+            _, func_name, func_args, action_type = actions[index]
+            async with semaphore:
+                results[index] = await self.chat.acting(
+                    self, action_type, func_name, func_args
+                )
+
+        tasks = [
+            asyncio.ensure_future(act(i))
+            for i, action in enumerate(actions)
+            if action[3] != ActionType.AGENT
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # don't leave the other actions running after the first failure
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        for i, action in enumerate(actions):
+            if action[3] == ActionType.AGENT:
+                await act(i)
+        return results
+
+    def speculate(self, tool_call: ChatCompletionMessageToolCall):
+        """
+        Starts the completed tool call of the streaming message in the background, if
+        it's side-effect free and won't ask for permission. The result is picked up by
+        tool_call when acting, so the tool messages are still added in order.
+        """
+        func_name = tool_call.function.name
+        try:
+            func_args = json.loads(tool_call.function.arguments)
+        except ValueError:
+            return
+        if self._attribute.permission == ActionPermission.ALWAYS:
+            return
+
+        if func_name in self.functions:
+            if not is_side_effect_free(self.functions[func_name], func_args):
+                return
+        elif func_name in self.toolkits:
+            if not self.toolkits[func_name].is_read_only(func_name):
+                return
+        else:
+            return
+
+        task = asyncio.create_task(
+            self.invoke_tool(func_name, func_args, in_thread=True)
+        )
+        key = (func_name, json.dumps(func_args, sort_keys=True))
+        self._speculative_tasks.setdefault(key, []).append(task)
+
+    def cancel_speculations(self):
+        for tasks in self._speculative_tasks.values():
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.exception()  # retrieved, the call wasn't acted on
+                task.cancel()
+        self._speculative_tasks.clear()
+
     async def tool_call(self, func_name, func_args) -> str:
+        key = (func_name, json.dumps(func_args, sort_keys=True))
+        if self._speculative_tasks.get(key):
+            return await self._speculative_tasks[key].pop(0)
+        return await self.invoke_tool(func_name, func_args)
+
+    async def invoke_tool(self, func_name, func_args, in_thread=False) -> str:
         func_result = ""
 
         # agent
@@ -195,25 +355,53 @@ class Agent(IAgent):
         # function
         if func_name in self.functions:
             func = self.functions[func_name]
-            func_result = func(**func_args)
+            if inspect.iscoroutinefunction(func):
+                func_result = await func(**func_args)
+            elif in_thread or self._max_parallel_actions > 1:
+                # don't block the other actions running at the same time
+                func_result = await asyncio.to_thread(func, **func_args)
+            else:
+                func_result = func(**func_args)
 
         # servers: TODO: add print message
         if func_name in self.toolkits:
 
-            client_session: ClientSession = self.toolkits[func_name].session
-            func_result: types.CallToolResult = await client_session.call_tool(
-                func_name, func_args
+            toolkit = self.toolkits[func_name]
+            supervised = (
+                self.mcp_supervisor and toolkit.name in self.mcp_supervisor.servers
+            )
+            func_result: types.CallToolResult = await cached_call_tool(
+                self.tool_result_cache,
+                toolkit.result_cache_ttl(func_name),
+                toolkit.name,
+                func_name,
+                func_args,
+                session=toolkit.session,
+                supervisor=self.mcp_supervisor if supervised else None,
+                shared_server=self._shared_servers.get(toolkit.name),
+                replayable=is_replayable(toolkit.tool(func_name)),
             )
             if func_result.isError:
-                raise ValueError(
-                    f"tool call {func_name} return err {func_result.content}"
+                error = tool_result_text(
+                    func_result.content, toolkit.result_budget(func_name)
                 )
+                raise ValueError(f"tool call {func_name} return err {error}")
             func_result = func_result.content
 
         if not func_result:
             raise ValueError(f"tool call {func_name} return none")
         return func_result
 
+    def tool_message_content(self, func_name, func_result) -> str:
+        """
+        The tool result kept in the memory. The MCP contents are normalized into their
+        text, within the byte budget of the tool, since every later request pays for it.
+        """
+        if func_name in self.toolkits and isinstance(func_result, list):
+            toolkit = self.toolkits[func_name]
+            return tool_result_text(func_result, toolkit.result_budget(func_name))
+        return f"{func_result}"
+
     def register_function_tools(self, tools):
         """
         Registers external tools by mapping their names to corresponding functions
@@ -274,42 +462,97 @@ class Agent(IAgent):
         toolkits: Dict[str, McpToolkit] = {}
         schemas = []
 
-        async def convert_toolkit(server_config: McpServerConfig):
+        if self.mcp_supervisor and not reconnect:
+            self.exit_stack.push_async_callback(self.mcp_supervisor.close)
+        if self._share_mcp_servers and not reconnect:
+            self.exit_stack.push_async_callback(self._release_shared_servers)
+
+        async def convert_toolkit(server_config: McpServerConfig) -> McpToolkit:
             server_param = server_config.server_param
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_param)
-            )
-            read, write = stdio_transport
-            client_session: ClientSession = await self.exit_stack.enter_async_context(
-                ClientSession(read, write)
-            )
-            await client_session.initialize()
+            supervised = None
+            if self._share_mcp_servers:
+                registry = MCPRegistry.shared()
+                previous = self._shared_servers.get(server_config.server_name)
+                if previous is not None:
+                    # reconnecting, start a new process instead of reusing a dead one
+                    registry.evict(previous)
+                    await self._release_shared_server(server_config.server_name)
+                shared = await registry.acquire(
+                    server_param, server_config.startup_timeout
+                )
+                self._shared_servers[server_config.server_name] = shared
+                client_session, startup_time = shared.session, shared.startup_time
+            elif self.mcp_supervisor:
+                start = time.perf_counter()
+                supervised = await self.mcp_supervisor.start(
+                    server_config.server_name,
+                    server_param,
+                    server_config.startup_timeout,
+                )
+                client_session = supervised.session
+                startup_time = time.perf_counter() - start
+            else:
+                client_session, startup_time = await start_session(
+                    self.exit_stack, server_param, server_config.startup_timeout
+                )
 
             # list available tools
-            tools_result: types.ListToolsResult = await client_session.list_tools()
+            if server_config.server_name in self._shared_servers:
+                tools = self._shared_servers[server_config.server_name].tools
+            else:
+                tools_result: types.ListToolsResult = await client_session.list_tools()
+                tools = tools_result.tools
+            # await client_session.list_resources()
             toolkit = McpToolkit(
                 name=server_config.server_name,
                 server_param=server_param,
                 exclude_tools=server_config.exclude_tools,
                 session=client_session,
-                tools=tools_result.tools,
+                tools=tools,
+                startup_time=startup_time,
+                cache_tools=server_config.cache_tools,
+                cache_ttl=server_config.cache_ttl,
+                result_budgets=server_config.result_budgets,
+                max_result_bytes=server_config.max_result_bytes,
             )
-            toolkits.update({tool.name: toolkit for tool in tools_result.tools})
-            schemas.extend(toolkit.tool_schemas)
+            if supervised:
 
-            # await client_session.list_resources()
+                def on_restart(session: ClientSession):
+                    toolkit.session = session
+                    self.tool_result_cache.invalidate(toolkit.name)
 
-        # TODO: consider run it the same time
-        for server_param in server_configs:
-            await convert_toolkit(server_param)
+                supervised.on_restart.append(on_restart)
+            if server_config.server_name in self._shared_servers:
+                self._attach_shared_server(server_config.server_name)
+            return toolkit
+
+        # start the servers at the same time, a failed one won't block the others
+        results = await asyncio.gather(
+            *(convert_toolkit(server_config) for server_config in server_configs),
+            return_exceptions=True,
+        )
+        console = Console()
+        for server_config, result in zip(server_configs, results):
+            if isinstance(result, BaseException):
+                reason = (
+                    f"not ready in {server_config.startup_timeout}s"
+                    if isinstance(result, asyncio.TimeoutError)
+                    else f"{result}"
+                )
+                console.print(
+                    f"[yellow]Skip MCP server '{server_config.server_name}': {reason}[/yellow]"
+                )
+                continue
+            toolkits.update({tool.name: result for tool in result.tools})
+            schemas.extend(result.tool_schemas)
 
         self.toolkits = toolkits
         self.toolkits_schemas = schemas
+        self.invalidate_tool_schemas()
 
         if reconnect:
             return
 
-        console = Console()
         table = Table(title="Available MCP Server Tools")
         table.add_column("Toolkit", style="cyan")
         table.add_column("Tool Name", style="cyan")
@@ -322,13 +565,67 @@ class Agent(IAgent):
                 key = (toolkit.name, tool.name)
                 # If the key hasn't been seen before, add it to the table and the set
                 if key not in seen_tools:
-                    table.add_row(toolkit.name, tool.name, tool.description)
+                    table.add_row(
+                        f"{toolkit.name} ({toolkit.startup_time:.1f}s)",
+                        tool.name,
+                        tool.description,
+                    )
                     # table.add_row(toolkit["name"], tool["name"], tool["description"])
                     seen_tools.add(key)
         print()
         console.print(table)
         # print()
 
+    def _attach_shared_server(self, toolkit_name: str):
+        """Follows the restarts and the tool changes of the shared server."""
+        shared = self._shared_servers[toolkit_name]
+
+        def on_restart(session: ClientSession):
+            for toolkit in self.toolkits.values():
+                if toolkit.name == toolkit_name:
+                    toolkit.session = session
+            self.tool_result_cache.invalidate(toolkit_name)
+
+        def on_tools_changed(tools: List[types.Tool]):
+            self.update_toolkit_tools(toolkit_name, tools)
+
+        shared.on_restart.append(on_restart)
+        shared.on_tools_changed.append(on_tools_changed)
+        self._shared_callbacks[toolkit_name] = (on_restart, on_tools_changed)
+
+    async def _release_shared_server(self, toolkit_name: str):
+        shared = self._shared_servers.pop(toolkit_name)
+        on_restart, on_tools_changed = self._shared_callbacks.pop(
+            toolkit_name, (None, None)
+        )
+        if on_restart in shared.on_restart:
+            shared.on_restart.remove(on_restart)
+        if on_tools_changed in shared.on_tools_changed:
+            shared.on_tools_changed.remove(on_tools_changed)
+        await MCPRegistry.shared().release(shared)
+
+    async def _release_shared_servers(self):
+        for toolkit_name in list(self._shared_servers):
+            await self._release_shared_server(toolkit_name)
+
+    def update_toolkit_tools(self, toolkit_name: str, tools: List[types.Tool]):
+        """Replaces the tools of the MCP server, e.g. once it notified they changed."""
+        previous = next(
+            (t for t in self.toolkits.values() if t.name == toolkit_name), None
+        )
+        if previous is None:
+            return
+        toolkit = McpToolkit.model_validate({**dict(previous), "tools": tools})
+        self.toolkits = {
+            name: t for name, t in self.toolkits.items() if t is not previous
+        }
+        self.toolkits.update({tool.name: toolkit for tool in toolkit.tools})
+        toolkits = {id(t): t for t in self.toolkits.values()}.values()
+        self.toolkits_schemas = [
+            schema for toolkit in toolkits for schema in toolkit.tool_schemas
+        ]
+        self.invalidate_tool_schemas()
+
     async def cleanup(self):
         """Clean up resources"""
         await self.exit_stack.aclose()
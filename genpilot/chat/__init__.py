@@ -1,3 +1,25 @@
-from ..abc.chat import IChat
-from .terminal_chat import TerminalChat
-from .streamlit_chat import StreamlitChat
+import importlib
+from typing import TYPE_CHECKING
+
+# each front-end is loaded on first use, e.g. the terminal doesn't import streamlit
+_LAZY_ATTRIBUTES = {
+    "IChat": "..abc.chat",
+    "TerminalChat": ".terminal_chat",
+    "StreamlitChat": ".streamlit_chat",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from ..abc.chat import IChat
+    from .terminal_chat import TerminalChat
+    from .streamlit_chat import StreamlitChat
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,7 +2,6 @@ import asyncio
 import rich.console
 import sys
 import rich
-from syncer import sync
 import os
 import rich.rule
 from rich.prompt import Prompt
@@ -13,6 +12,7 @@ from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.padding import Padding
 import threading
+from contextlib import contextmanager
 from rich.padding import Padding
 from typing import Callable, Any, List, Tuple, Union
 import time
@@ -21,12 +21,7 @@ import json
 from enum import Enum
 from mcp import StdioServerParameters, types, ClientSession
 
-from litellm import completion
-from litellm.utils import (
-    ModelResponse,
-    CustomStreamWrapper,
-    ChatCompletionDeltaToolCall,
-)
+from typing import TYPE_CHECKING
 from openai.types.chat import (
     ChatCompletionUserMessageParam,
     ChatCompletionMessage,
@@ -43,12 +38,17 @@ from openai.types.chat.chat_completion_message_tool_call import Function
 from genpilot.abc.agent import ActionPermission, ActionType, Attribute, final_answer
 from genpilot.tools.code_executor import terminal_code_executor_printer
 from genpilot.utils.format import is_valid_yaml
+from genpilot.utils.prompt_cache import cache_breakpoints
+from genpilot.utils.tool_call_assembler import ToolCallAssembler
 from ..abc.agent import IAgent
 from ..abc.chat import IChat
 from ..tools.code_executor import code_executor, terminal_code_executor_printer
 
 import logging
 
+if TYPE_CHECKING:
+    from litellm.utils import ModelResponse, CustomStreamWrapper
+
 # Set logging level to WARNING or higher to suppress INFO level logs
 logging.basicConfig(level=logging.WARNING)
 
@@ -65,6 +65,14 @@ class TerminalChat(IChat):
         } | avatars
         self.previous_print = ""
 
+        # the agent might act several tools at the same time: serialize the tool
+        # printing and approval, and share one spinner across the running tools
+        self._approval_lock = asyncio.Lock()
+        self._action_status = None
+        self._running_actions = 0
+        # the spinner is paused while asking for the approval
+        self._prompting = False
+
         self.tool_printers = {}
         self.register_tool_printer(code_executor, terminal_code_executor_printer)
 
@@ -125,7 +133,10 @@ class TerminalChat(IChat):
         print()
 
     async def reasoning(
-        self, agent: IAgent, tool_schemas: List
+        self,
+        agent: IAgent,
+        tool_schemas: List,
+        on_tool_call: Callable[[ChatCompletionMessageToolCall], None] = None,
     ) -> ChatCompletionAssistantMessageParam:
         """
         Facilitates interaction with the LLM model via the aisuite client.
@@ -133,6 +144,8 @@ class TerminalChat(IChat):
         Args:
             agent (IAgent): The agent to reason with the LLM model.
             client (Client): The aisuite client to interact with the model.
+            on_tool_call (Callable, optional): Called with each tool call once its
+                arguments are complete, before the rest of the stream finishes.
         """
         if agent.attribute.human_on_loop:
             i = input("🚀 ").strip().lower()
@@ -144,20 +157,38 @@ class TerminalChat(IChat):
                 if self._ask_input(agent, exit=["bye", "bye"], finish=["quit", "q"]):
                     return None
 
+        # litellm takes seconds to import, load it on the first reasoning
+        from litellm import acompletion
+
         response = None
         avatar = self.avatars.get(agent.attribute.name, self.avatars.get("assistant"))
         try:
             # rprint = rich.get_console().print
             # rprint(tool_schemas)
 
-            with self.console.status(
-                f"{avatar} [cyan]{agent.attribute.name} ...[/]", spinner="aesthetic"
+            messages = agent.attribute.memory.get()
+            model_config = agent.attribute.model_config
+            if agent.attribute.prompt_cache:
+                messages, tool_schemas = cache_breakpoints(
+                    agent.attribute.model_name, messages, tool_schemas
+                )
+                # report the usage, including the cached tokens, in the stream
+                if model_config.get("stream") and "stream_options" not in model_config:
+                    model_config = model_config | {
+                        "stream_options": {"include_usage": True}
+                    }
+
+            # the agents reasoning at the same time share one spinner
+            with self.running_status(
+                "aesthetic", f"{avatar} [cyan]{agent.attribute.name} ...[/]"
             ):
-                response = completion(
+                # awaitable completion: keep the event loop free for the other
+                # agents, MCP sessions and tool calls sharing it
+                response = await acompletion(
                     model=agent.attribute.model_name,
-                    messages=agent.attribute.memory.get(),
-                    tools=tool_schemas,
-                    **agent.attribute.model_config,
+                    messages=messages,
+                    tools=list(tool_schemas),
+                    **model_config,
                 )
         except Exception as e:
             self.console.print(agent.attribute.memory.get())
@@ -165,8 +196,12 @@ class TerminalChat(IChat):
             import traceback
 
             traceback.print_exc()
+        if response is None:
+            return None
 
-        completion_message = await self.reasoning_print(response, agent)
+        completion_message = await self.reasoning_print(
+            response, agent, on_tool_call
+        )
 
         message = completion_message.model_dump(mode="json")
         # for 'role:assistant' the following must be satisfied[('messages.2' : property 'refusal' is unsupported
@@ -185,8 +220,12 @@ class TerminalChat(IChat):
     #    - print invoking function with title
     # 4. print tool call in invoking
     async def reasoning_print(
-        self, response: Union[ModelResponse, CustomStreamWrapper], agent: IAgent
+        self,
+        response: Union["ModelResponse", "CustomStreamWrapper"],
+        agent: IAgent,
+        on_tool_call: Callable[[ChatCompletionMessageToolCall], None] = None,
     ) -> ChatCompletionMessage:
+        from litellm.utils import CustomStreamWrapper
 
         # import rich
 
@@ -199,31 +238,19 @@ class TerminalChat(IChat):
             completion_message_tool_calls: List[ChatCompletionMessageToolCall] = []
             completion_message_content = ""
             print_content = False
-            for chunk in response:
+            # merge the tool call fragments by index, each call is handed over to
+            # on_tool_call as soon as its arguments are complete
+            assembler = ToolCallAssembler()
+            async for chunk in response:
+                agent.attribute.cache_usage.update(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
                 delta = chunk.choices[0].delta
                 # print(delta, end="\n")
                 # not print tool in here
                 if delta.tool_calls and len(delta.tool_calls) > 0:
-                    for delta_tool_call in delta.tool_calls:
-                        # for the final function call
-                        content = await self.get_answer_tool_result(
-                            delta_tool_call, agent
-                        )
-                        if content:
-                            completion_message_content = content
-                            break
-
-                        # tool_call is ChatCompletionDeltaToolCall
-                        completion_message_tool_calls.append(
-                            ChatCompletionMessageToolCall(
-                                id=delta_tool_call.id,
-                                function=Function(
-                                    arguments=delta_tool_call.function.arguments,
-                                    name=delta_tool_call.function.name,
-                                ),
-                                type=delta_tool_call.type,
-                            )
-                        )
+                    for tool_call in assembler.add(delta.tool_calls):
+                        self._tool_call_completed(tool_call, on_tool_call)
                 if delta.content is not None and delta.content != "":
                     # Scenario 1: print delta content
                     if not print_content:
@@ -231,12 +258,26 @@ class TerminalChat(IChat):
                         print_content = True
                     self.console.print(delta.content, end="")
                     completion_message_content += delta.content
+            for tool_call in assembler.finish():
+                self._tool_call_completed(tool_call, on_tool_call)
+            if print_content:
+                self.console.print()  # after print the delta content
+
+            for tool_call in assembler.tool_calls:
+                # for the final function call
+                content = await self.get_answer_tool_result(tool_call, agent)
+                if content:
+                    completion_message_content = content
+                    self.content_print(agent, content)
+                    continue
+                completion_message_tool_calls.append(tool_call)
+
             if len(completion_message_tool_calls) > 0:
                 completion_message.tool_calls = completion_message_tool_calls
             if completion_message_content != "":
-                self.console.print()  # after print the delta content
                 completion_message.content = completion_message_content
         else:
+            agent.attribute.cache_usage.update(getattr(response, "usage", None))
             completion_message = response.choices[0].message
 
             # if final answer, convert it into content message
@@ -250,22 +291,34 @@ class TerminalChat(IChat):
 
             if completion_message.content:
                 # Scenario 2: print complete content
-                self.agent_title_print(agent)
-                if is_valid_yaml(completion_message.content):
-                    syntax = Syntax(
-                        completion_message.content,
-                        "yaml",
-                        theme="monokai",
-                        line_numbers=True,
-                    )
-                    self.console.print(Padding(syntax, (0, 0, 1, 3)))
-                else:
-                    markdown = Markdown(completion_message.content)
-                    self.console.print(Padding(markdown, (0, 0, 1, 3)))
-                # self.console.print(Padding(completion_message.content, (0, 0, 1, 3)))
+                self.content_print(agent, completion_message.content)
 
         return completion_message
 
+    def content_print(self, agent: IAgent, content: str):
+        self.agent_title_print(agent)
+        if is_valid_yaml(content):
+            syntax = Syntax(
+                content,
+                "yaml",
+                theme="monokai",
+                line_numbers=True,
+            )
+            self.console.print(Padding(syntax, (0, 0, 1, 3)))
+        else:
+            markdown = Markdown(content)
+            self.console.print(Padding(markdown, (0, 0, 1, 3)))
+        # self.console.print(Padding(content, (0, 0, 1, 3)))
+
+    def _tool_call_completed(
+        self,
+        tool_call: ChatCompletionMessageToolCall,
+        on_tool_call: Callable[[ChatCompletionMessageToolCall], None] = None,
+    ):
+        # the final answer is converted into the content, not acted
+        if on_tool_call and tool_call.function.name != final_answer.__name__:
+            on_tool_call(tool_call)
+
     async def get_answer_tool_result(
         self, tool_call: ChatCompletionMessageToolCall, agent: IAgent
     ) -> str:
@@ -296,17 +349,15 @@ class TerminalChat(IChat):
         result = ""
         # print tool info
         if action_type == ActionType.FUNCTION:
-            self.tool_print(agent, func_name, func_args)
+            async with self._approval_lock:
+                self.tool_print(agent, func_name, func_args)
 
-            # check the permission
-            if not self.before_invoking(
-                agent,
-                func_edit=0,
-            ):
-                return f"Action({func_name}: {func_args}) are not allowed by the user."
+                # check the permission
+                if not await self.approve(agent, func_edit=0):
+                    return f"Action({func_name}: {func_args}) are not allowed by the user."
 
             # invoke function
-            with self.console.status(f"", spinner=spinner):
+            with self.running_status(spinner):
                 result = await agent.tool_call(func_name, func_args)
 
             # print result
@@ -316,17 +367,15 @@ class TerminalChat(IChat):
 
         # print tool info
         elif action_type == ActionType.SERVER:
-            self.tool_print(agent, func_name, func_args)
+            async with self._approval_lock:
+                self.tool_print(agent, func_name, func_args)
 
-            # check the permission
-            if not self.before_invoking(
-                agent,
-                func_edit=0,
-            ):
-                return f"Action({func_name}: {func_args}) are not allowed by the user."
+                # check the permission
+                if not await self.approve(agent, func_edit=0):
+                    return f"Action({func_name}: {func_args}) are not allowed by the user."
 
             # invoke function
-            with self.console.status(f"", spinner=spinner):
+            with self.running_status(spinner):
                 contents: types.CallToolResult = await agent.tool_call(
                     func_name, func_args
                 )
@@ -371,7 +420,7 @@ class TerminalChat(IChat):
             print()
             return
 
-        if func_name == "kubectl_cmd":
+        if func_name in ("kubectl_cmd", "akubectl_cmd"):
             block = func_args["command"] + func_args["input"]
             self.console.print(
                 f"   🛠  [yellow]cluster: {func_args['cluster_name']}[/yellow]"
@@ -403,6 +452,20 @@ class TerminalChat(IChat):
                     line_numbers=True,
                 )
             )
+        elif func_name == "kubectl_fanout":
+            clusters = func_args.get("cluster_names") or "all"
+            if isinstance(clusters, list):
+                clusters = ", ".join(clusters)
+            self.console.print(f"   🛠  [yellow]clusters: {clusters}[/yellow]")
+            rich.print()
+            self.console.print(
+                Syntax(
+                    func_args["command"],
+                    "shell",
+                    theme="monokai",
+                    line_numbers=True,
+                )
+            )
 
         else:
             self.console.print(
@@ -410,13 +473,33 @@ class TerminalChat(IChat):
             )
         rich.print()
 
-    def before_invoking(self, agent: IAgent, func_edit=0) -> bool:
-        # check the agent function
+    def needs_approval(self, agent: IAgent, func_edit=0) -> bool:
         permission = agent.attribute.permission
         if permission == ActionPermission.NONE:
+            return False
+        # enable auto
+        return not (permission == ActionPermission.AUTO and func_edit == 0)
+
+    async def approve(self, agent: IAgent, func_edit=0) -> bool:
+        """
+        Asks for the approval off the event loop, so the other running actions carry
+        on meanwhile, while their spinner is paused on the loop.
+        """
+        if not self.needs_approval(agent, func_edit):
             return True
+        self._prompting = True
+        if self._action_status:
+            self._action_status.stop()
+        try:
+            return await asyncio.to_thread(self.before_invoking, agent, func_edit)
+        finally:
+            self._prompting = False
+            if self._action_status:
+                self._action_status.start()
 
-        if permission == ActionPermission.AUTO and func_edit == 0:  # enable auto
+    def before_invoking(self, agent: IAgent, func_edit=0) -> bool:
+        # check the agent function
+        if not self.needs_approval(agent, func_edit):
             return True
 
         while True:
@@ -432,6 +515,25 @@ class TerminalChat(IChat):
                     "  🔒 Invalid input! Please enter 'Y' or 'N'.\n", style="yellow"
                 )
 
+    @contextmanager
+    def running_status(self, spinner, status=""):
+        """
+        Show a spinner while the models or the tools are running, the concurrent ones
+        share the same one since only a live display can be active on the console.
+        """
+        if self._running_actions == 0:
+            self._action_status = self.console.status(status, spinner=spinner)
+            if not self._prompting:
+                self._action_status.start()
+        self._running_actions += 1
+        try:
+            yield
+        finally:
+            self._running_actions -= 1
+            if self._running_actions == 0:
+                self._action_status.stop()
+                self._action_status = None
+
     def _ask_input(
         self,
         agent: IAgent,
@@ -471,6 +573,22 @@ class TerminalChat(IChat):
                     print()
                     continue
 
+                case "/usage" | "/u":
+                    usage = agent.attribute.cache_usage
+                    self.console.print(
+                        f"requests: {usage.requests}, prompt tokens: {usage.prompt_tokens}, "
+                        f"cached tokens: {usage.cached_tokens} ({usage.hit_rate:.1%})"
+                    )
+                    tool_cache = getattr(agent, "tool_result_cache", None)
+                    if tool_cache and (tool_cache.hits or tool_cache.misses):
+                        self.console.print(
+                            f"tool result cache: {tool_cache.hits} hits, "
+                            f"{tool_cache.misses} misses ({tool_cache.hit_rate:.1%}), "
+                            f"{tool_cache.size} bytes"
+                        )
+                    print()
+                    continue
+
                 case "/pop":
                     msg = agent.attribute.memory.pop()
                     self.console.print(msg)
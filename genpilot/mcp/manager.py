@@ -5,19 +5,34 @@ from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from genpilot.mcp.config import AppConfig
 from genpilot.mcp.server import MCPServer
+from genpilot.mcp.session import start_session
+from genpilot.mcp.supervisor import SessionSupervisor
+from genpilot.mcp.registry import MCPRegistry, SharedServer
 from rich.console import Console
 from rich.table import Table
 import asyncio
 import os
+import time
 
 
 class MCPServerManager:
-    def __init__(self, config_path: str, includes=None, display_tools=True):
+    def __init__(
+        self,
+        config_path: str,
+        includes=None,
+        display_tools=True,
+        supervisor: SessionSupervisor = None,
+        shared: bool = False,
+    ):
         """init the mcp server by the config file
 
         Args:
             config_path (str): json config file
             includes (_type_, optional): include mcp servers. Defaults to None means all.
+            supervisor (SessionSupervisor, optional): Restarts a dead server alone and
+                retries its calls. Defaults to None means the sessions aren't supervised.
+            shared (bool, optional): Share the server processes with the other managers
+                and agents of the process. Defaults to False.
         """
         self.servers: List[MCPServer] = []
         self.exit_stack = AsyncExitStack()  # Single exit stack to manage all sessions
@@ -25,9 +40,13 @@ class MCPServerManager:
         self.includes: List[str] = includes  # includes servers
         self.tool_validators: Dict[str, Callable[[dict], str]] = {}
         self.display_tools = display_tools
+        self.supervisor = supervisor
+        self.shared = shared
 
     async def __aenter__(self):
         await self.exit_stack.__aenter__()  # Enter exit stack context
+        if self.supervisor is not None:
+            self.exit_stack.push_async_callback(self.supervisor.close)
         await self.connect_to_server(self.config_path)
         if self.display_tools:
             await self._display_available_tools()
@@ -71,32 +90,86 @@ class MCPServerManager:
         mcp_servers = [
             MCPServer(
                 name=name,
-                server_params=StdioServerParameters(
-                    command=config.command,
-                    args=config.args or [],
-                    env={**(config.env or {}), **os.environ},
-                ),
+                server_params=config.server_params(),
                 exclude_tools=config.exclude_tools or [],
+                startup_timeout=config.startup_timeout,
+                cache_tools=config.cache_tools or {},
+                cache_ttl=config.cache_ttl,
+                result_budgets=config.result_budgets or {},
+                max_result_bytes=config.max_result_bytes,
             )
             for name, config in app_config.get_enabled_servers().items()
+            if not self.includes or name in self.includes
         ]
 
+        # start the servers at the same time, a failed one won't block the others
+        results = await asyncio.gather(
+            *(self._initialize_session(server) for server in mcp_servers),
+            return_exceptions=True,
+        )
+
         self.servers = []
-        for server in mcp_servers:
-            if not self.includes or server.name in self.includes:
-                await self._initialize_session(server)  # Await one by one
-                self.servers.append(server)
+        for server, result in zip(mcp_servers, results):
+            if isinstance(result, BaseException):
+                reason = (
+                    f"not ready in {server.startup_timeout}s"
+                    if isinstance(result, asyncio.TimeoutError)
+                    else f"{result}"
+                )
+                Console().print(
+                    f"[yellow]Skip MCP server '{server.name}': {reason}[/yellow]"
+                )
+                continue
+            self.servers.append(server)
 
     async def _initialize_session(self, mcp_server: MCPServer):
         """Initialize a session kit for a given MCP server configuration."""
-        read, write = await self.exit_stack.enter_async_context(
-            stdio_client(mcp_server.server_params)
-        )
-        client_session: ClientSession = await self.exit_stack.enter_async_context(
-            ClientSession(read, write)
+        if self.shared:
+            registry = MCPRegistry.shared()
+            shared = await registry.acquire(
+                mcp_server.server_params, mcp_server.startup_timeout
+            )
+            self.exit_stack.push_async_callback(registry.release, shared)
+            # kept on the shared server, so they're attached to its restarted sessions
+            shared.notification_handlers.append(mcp_server.on_notification)
+            shared.session.notification_handlers.append(mcp_server.on_notification)
+            shared.on_restart.append(mcp_server.on_restart)
+            self.exit_stack.callback(self._detach, shared, mcp_server)
+            mcp_server.shared_server = shared
+            mcp_server.client_session = shared.session
+            mcp_server.startup_time = shared.startup_time
+            return
+
+        if self.supervisor is not None:
+            start = time.perf_counter()
+            supervised = await self.supervisor.start(
+                mcp_server.name,
+                mcp_server.server_params,
+                mcp_server.startup_timeout,
+                notification_handlers=[mcp_server.on_notification],
+            )
+            supervised.on_restart.append(mcp_server.on_restart)
+            mcp_server.supervisor = self.supervisor
+            mcp_server.client_session = supervised.session
+            mcp_server.startup_time = time.perf_counter() - start
+            return
+
+        client_session, startup_time = await start_session(
+            self.exit_stack, mcp_server.server_params, mcp_server.startup_timeout
         )
-        await client_session.initialize()
+        client_session.notification_handlers.append(mcp_server.on_notification)
         mcp_server.client_session = client_session
+        mcp_server.startup_time = startup_time
+
+    @staticmethod
+    def _detach(shared: SharedServer, mcp_server: MCPServer):
+        for handlers, handler in (
+            (shared.notification_handlers, mcp_server.on_notification),
+            (shared.session.notification_handlers, mcp_server.on_notification),
+            (shared.on_restart, mcp_server.on_restart),
+        ):
+            if handler in handlers:
+                handlers.remove(handler)
 
     async def _display_available_tools(self):
         """Displays available MCP tools in a formatted table using parallel execution."""
@@ -118,7 +191,11 @@ class MCPServerManager:
             for tool in tools:
                 key = (session.name, tool.name)
                 if key not in seen_tools:
-                    table.add_row(session.name, tool.name, tool.description)
+                    table.add_row(
+                        f"{session.name} ({session.startup_time:.1f}s)",
+                        tool.name,
+                        tool.description,
+                    )
                     seen_tools.add(key)
 
         console.print(table)
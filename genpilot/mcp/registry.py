@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import weakref
+from contextlib import AsyncExitStack, suppress
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mcp import types
+from rich.console import Console
+
+from genpilot.mcp.session import (
+    DEFAULT_STARTUP_TIMEOUT,
+    NotifyingClientSession,
+    start_session,
+)
+from genpilot.mcp.supervisor import (
+    UNSENT_ERRORS,
+    is_transport_error,
+    lost_call_error,
+)
+from genpilot.mcp.transport import RemoteServerParameters, ServerParameters
+
+logger = logging.getLogger(__name__)
+
+
+class SharedServer:
+    """
+    A server process shared by the agents, along with its tool catalog. It's restarted
+    in place when its transport dies, so the agents holding it carry on together.
+    """
+
+    def __init__(
+        self,
+        key: Tuple,
+        server_params: ServerParameters,
+        startup_timeout: Optional[float] = DEFAULT_STARTUP_TIMEOUT,
+        max_concurrent_calls: Optional[int] = None,
+    ):
+        self.key = key
+        self.server_params = server_params
+        self.startup_timeout = startup_timeout
+        self.session: Optional[NotifyingClientSession] = None
+        self.tools: List[types.Tool] = []
+        self.startup_time = 0.0
+        # the agents using the server, it's closed when the last one releases it
+        self.refs = 0
+        # set when the server couldn't be restarted, the next acquire starts a new one
+        self.failed = False
+        # bumped on every restart, so the concurrent failed calls restart it once
+        self.generation = 0
+        # attached to every new session
+        self.notification_handlers: List[
+            Callable[[types.ServerNotification], None]
+        ] = []
+        # called with the new session after a restart
+        self.on_restart: List[Callable[[NotifyingClientSession], None]] = []
+        # called with the new tools after the server notifies the tools list changed
+        self.on_tools_changed: List[Callable[[List[types.Tool]], None]] = []
+        self._exit_stack = AsyncExitStack()
+        self._restart_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._semaphore = (
+            asyncio.Semaphore(max_concurrent_calls) if max_concurrent_calls else None
+        )
+
+    @property
+    def name(self) -> str:
+        return getattr(self.server_params, "url", None) or self.server_params.command
+
+    async def start(self):
+        self.session, self.startup_time = await start_session(
+            self._exit_stack, self.server_params, self.startup_timeout
+        )
+        self.session.notification_handlers.append(self._on_notification)
+        self.session.notification_handlers.extend(self.notification_handlers)
+        self.tools = (await self.session.list_tools()).tools
+
+    async def call_tool(
+        self, tool_name: str, arguments: dict, replayable: bool = False
+    ) -> types.CallToolResult:
+        """
+        Calls the tool over the shared session, the concurrent requests of the agents
+        are multiplexed by their request ids, bounded by max_concurrent_calls. If the
+        transport dies, the server is restarted, and the call is retried once if it
+        never reached the server or it's replayable, since the server might have run
+        it already.
+        """
+        generation = self.generation
+        try:
+            return await self._call_tool(tool_name, arguments)
+        except Exception as e:
+            if not is_transport_error(e):
+                raise
+            await self.restart(generation, f"{e}" or type(e).__name__)
+            if not replayable and not isinstance(e, UNSENT_ERRORS):
+                raise lost_call_error(self.name, tool_name, e) from e
+        return await self._call_tool(tool_name, arguments)
+
+    async def _call_tool(self, tool_name: str, arguments: dict) -> types.CallToolResult:
+        if self._semaphore is None:
+            return await self.session.call_tool(tool_name, arguments)
+        async with self._semaphore:
+            return await self.session.call_tool(tool_name, arguments)
+
+    async def restart(self, generation: Optional[int] = None, reason=None):
+        """
+        Restarts the server process, unless it's been restarted since the generation.
+
+        Raises:
+            ConnectionError: If the server can't be restarted, it's marked failed.
+        """
+        async with self._restart_lock:
+            if generation is not None and generation != self.generation:
+                return
+            Console().print(
+                f"[yellow]Shared MCP server '{self.name}' is down, "
+                f"restarting: {reason}[/yellow]"
+            )
+            exit_stack, self._exit_stack = self._exit_stack, AsyncExitStack()
+            with suppress(Exception):
+                await exit_stack.aclose()
+            try:
+                await self.start()
+            except Exception as e:
+                self.failed = True
+                with suppress(Exception):
+                    await self._exit_stack.aclose()
+                raise ConnectionError(f"failed to restart the MCP server: {e}") from e
+            self.generation += 1
+            for on_restart in self.on_restart:
+                on_restart(self.session)
+
+    def _on_notification(self, notification: types.ServerNotification):
+        if isinstance(notification.root, types.ToolListChangedNotification):
+            self._refresh_task = asyncio.create_task(self._refresh_tools())
+
+    async def _refresh_tools(self):
+        try:
+            self.tools = (await self.session.list_tools()).tools
+        except Exception as e:
+            logger.warning(f"failed to refresh the shared MCP server tools: {e}")
+            return
+        for on_tools_changed in self.on_tools_changed:
+            on_tools_changed(self.tools)
+
+    async def close(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        with suppress(Exception):
+            await self._exit_stack.aclose()
+
+
+class MCPRegistry:
+    """
+    Starts each configured server once per process, instead of once per agent,
+    and reference counts the agents using it. The servers are bound to the event loop
+    they're started in, so there is a registry per loop, see `MCPRegistry.shared()`.
+
+    Args:
+        max_concurrent_calls (int, optional): The max in-flight calls to a server.
+    """
+
+    # the registry per event loop
+    _registries: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def __init__(self, max_concurrent_calls: Optional[int] = 16):
+        self.max_concurrent_calls = max_concurrent_calls
+        self.servers: Dict[Tuple, SharedServer] = {}
+        self._starting: Dict[Tuple, asyncio.Task] = {}
+
+    @classmethod
+    def shared(cls) -> "MCPRegistry":
+        """The registry of the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in cls._registries:
+            cls._registries[loop] = cls()
+        return cls._registries[loop]
+
+    @staticmethod
+    def server_key(server_params: ServerParameters) -> Tuple:
+        if isinstance(server_params, RemoteServerParameters):
+            return (
+                server_params.url,
+                server_params.transport,
+                tuple(sorted(server_params.headers.items())),
+            )
+        return (
+            server_params.command,
+            tuple(server_params.args or []),
+            tuple(sorted((server_params.env or {}).items())),
+            str(getattr(server_params, "cwd", None) or ""),
+        )
+
+    async def acquire(
+        self,
+        server_params: ServerParameters,
+        startup_timeout: Optional[float] = DEFAULT_STARTUP_TIMEOUT,
+    ) -> SharedServer:
+        """
+        Returns the running server of the parameters, started by the first caller while
+        the concurrent ones wait for it, a failed one is replaced. Release it once done.
+
+        Raises:
+            asyncio.TimeoutError: If the server isn't ready within the timeout.
+        """
+        key = self.server_key(server_params)
+        server = self.servers.get(key)
+        if server is not None and server.failed:
+            self.evict(server)
+            server = None
+        if server is None:
+            if key not in self._starting:
+                self._starting[key] = asyncio.create_task(
+                    self._start(key, server_params, startup_timeout)
+                )
+            try:
+                # shielded, a cancelled caller doesn't stop the start for the others
+                server = await asyncio.shield(self._starting[key])
+            finally:
+                if self._starting.get(key) is not None and self._starting[key].done():
+                    self._starting.pop(key, None)
+        server.refs += 1
+        return server
+
+    async def _start(
+        self, key: Tuple, server_params: ServerParameters, timeout: Optional[float]
+    ) -> SharedServer:
+        server = SharedServer(key, server_params, timeout, self.max_concurrent_calls)
+        try:
+            await server.start()
+        except BaseException:
+            await server.close()
+            raise
+        self.servers[key] = server
+        return server
+
+    def evict(self, server: SharedServer):
+        """
+        Drops the server from the registry, e.g. it's failed or reconnected, so the next
+        acquire starts a new one. It's closed once the agents using it release it.
+        """
+        server.failed = True
+        if self.servers.get(server.key) is server:
+            del self.servers[server.key]
+
+    async def release(self, server: SharedServer):
+        """Releases the server, it's closed when no agent uses it anymore."""
+        server.refs -= 1
+        if server.refs > 0:
+            return
+        if self.servers.get(server.key) is server:
+            del self.servers[server.key]
+        await server.close()
+
+    async def close(self):
+        """Closes all the servers, regardless of the agents still using them."""
+        servers, self.servers = list(self.servers.values()), {}
+        for server in servers:
+            server.refs = 0
+            await server.close()
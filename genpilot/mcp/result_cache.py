@@ -0,0 +1,175 @@
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from mcp import ClientSession, Tool, types
+
+from genpilot.mcp.registry import SharedServer
+from genpilot.mcp.supervisor import SessionSupervisor
+
+# the seconds to reuse the result of a tool listed in `cache_tools` without its own
+DEFAULT_TOOL_CACHE_TTL = 30.0
+
+
+def cache_tools_config(cache_tools, cache_ttl: float = 0) -> Dict[str, float]:
+    """
+    Normalizes the `cache_tools` of a server config, either the tool names or the
+    seconds per tool name, into the seconds per tool name.
+    """
+    if isinstance(cache_tools, dict):
+        return {name: float(ttl) for name, ttl in cache_tools.items()}
+    ttl = cache_ttl or DEFAULT_TOOL_CACHE_TTL
+    return {name: ttl for name in cache_tools or []}
+
+
+def tool_cache_ttl(
+    tool: Optional[Tool], cache_tools: Dict[str, float], cache_ttl: float = 0
+) -> float:
+    """
+    Returns the seconds to cache the tool results: the configured ones, or the server
+    `cache_ttl` for the tools annotated read-only, 0 means not cacheable.
+    """
+    if tool is None:
+        return 0.0
+    if tool.name in cache_tools:
+        return cache_tools[tool.name]
+    annotations = getattr(tool, "annotations", None)
+    if cache_ttl and annotations and getattr(annotations, "readOnlyHint", None):
+        return cache_ttl
+    return 0.0
+
+
+class ToolResultCache:
+    """
+    A bounded LRU cache of the MCP tool results, keyed by the server, the tool name and
+    the canonical arguments, so repeating an identical read-only call within its TTL
+    doesn't go to the server again.
+
+    Args:
+        max_entries (int): The max results kept.
+        max_bytes (int): The max estimated size of the results kept.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries: OrderedDict[Tuple[str, str, str], Tuple[float, int, Any]] = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def key(server: str, tool_name: str, arguments: dict) -> Tuple[str, str, str]:
+        arguments = json.dumps(
+            arguments or {}, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return server, tool_name, arguments
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: Tuple[str, str, str], result: Any, ttl: float):
+        size = self.sizeof(result)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, size, result)
+        self.size += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.size > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, server: str = None):
+        """Drops the results of the server, e.g. after calling a mutating tool, or all."""
+        for key in [key for key in self._entries if server in (None, key[0])]:
+            self._remove(key)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def _remove(self, key: Tuple[str, str, str]):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    @staticmethod
+    def sizeof(result: Any) -> int:
+        """Estimates the size of the result by its text, or blob, content."""
+        if isinstance(getattr(result, "content", None), list):
+            result = result.content  # CallToolResult
+        contents = result if isinstance(result, list) else [result]
+        size = 0
+        for content in contents:
+            for field in ("text", "data", "blob"):
+                value = getattr(content, field, None)
+                if isinstance(value, str):
+                    size += len(value)
+            resource = getattr(content, "resource", None)
+            if resource is not None:
+                size += ToolResultCache.sizeof(resource)
+            size += sys.getsizeof(content)
+        return size
+
+
+async def cached_call_tool(
+    cache: ToolResultCache,
+    ttl: float,
+    server_name: str,
+    tool_name: str,
+    arguments: dict,
+    session: Optional[ClientSession] = None,
+    supervisor: Optional[SessionSupervisor] = None,
+    shared_server: Optional[SharedServer] = None,
+    replayable: bool = False,
+) -> types.CallToolResult:
+    """
+    Calls the tool over the shared server process, the supervised session or the own
+    session of the server, whichever is given first. The result of a cacheable tool,
+    ttl > 0, is reused within its TTL, while calling the other tools drops the cached
+    results of the server. A replayable call, see `is_replayable`, is retried even if
+    it was lost in flight when the server died.
+    """
+    key = cache.key(server_name, tool_name, arguments)
+    if ttl:
+        result = cache.get(key)
+        if result is not None:
+            return result
+    else:
+        # the tool might change what the cached ones read
+        cache.invalidate(server_name)
+
+    if shared_server is not None:
+        result = await shared_server.call_tool(tool_name, arguments, replayable)
+    elif supervisor is not None:
+        result = await supervisor.call_tool(
+            server_name, tool_name, arguments, replayable
+        )
+    else:
+        result = await session.call_tool(tool_name, arguments)
+    if ttl and not result.isError:
+        cache.put(key, result, ttl)
+    return result
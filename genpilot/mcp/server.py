@@ -1,20 +1,102 @@
+import asyncio
 import json
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from mcp import StdioServerParameters, types, ClientSession, Tool
 from typing import Optional, List, Any, Dict, Callable
 from agents.tool import FunctionTool
 from agents.run_context import RunContextWrapper
 
+from genpilot.mcp.result_cache import (
+    ToolResultCache,
+    cached_call_tool,
+    tool_cache_ttl,
+)
+from genpilot.mcp.supervisor import SessionSupervisor, is_replayable
+from genpilot.mcp.registry import SharedServer
+from genpilot.mcp.transport import ServerParameters
+from genpilot.mcp.tool_result import (
+    DEFAULT_MAX_RESULT_BYTES,
+    tool_result_budget,
+    tool_result_text,
+)
+
 
 class MCPServer(BaseModel):
     name: str
-    server_params: StdioServerParameters
+    server_params: ServerParameters
     exclude_tools: list[str] = []
     client_session: Optional[ClientSession] = None
+    startup_timeout: Optional[float] = None
+    # seconds taken to start and initialize the server
+    startup_time: Optional[float] = None
+    # seconds to cache the tool results by name, and of the read-only annotated tools
+    cache_tools: Dict[str, float] = {}
+    cache_ttl: float = 0
+    # the max bytes of a tool result returned to the agent, by tool name and by default
+    result_budgets: Dict[str, int] = {}
+    max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES
+    # restarts the dead session and retries the calls, if supervised
+    supervisor: Optional[SessionSupervisor] = None
+    # the server process shared with the other agents, if shared
+    shared_server: Optional[SharedServer] = None
+
+    # the tool catalog and the agent SDK tools built on it, refreshed only when the
+    # server notifies the tools list changed or the cache is invalidated
+    _tools: Optional[List[Tool]] = PrivateAttr(default=None)
+    _function_tools: Optional[List[FunctionTool]] = PrivateAttr(default=None)
+    _tool_validators: Optional[Dict] = PrivateAttr(default=None)
+    _tools_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+    _result_cache: ToolResultCache = PrivateAttr(default_factory=ToolResultCache)
 
     class Config:
         arbitrary_types_allowed = True  # Allow arbitrary types like ClientSession
 
+    def on_notification(self, notification: types.ServerNotification):
+        """Handles the server notifications of the client session."""
+        if isinstance(notification.root, types.ToolListChangedNotification):
+            self.invalidate_tools()
+
+    def on_restart(self, client_session: ClientSession):
+        """Switches to the new session of the restarted server."""
+        self.client_session = client_session
+        self.invalidate_tools()
+        self._result_cache.invalidate(self.name)
+
+    def invalidate_tools(self):
+        """Drops the cached tools, the next listing fetches them from the server."""
+        self._tools = None
+        self._function_tools = None
+
+    async def list_tools(self) -> List[Tool]:
+        """Lists the server tools, fetched once and cached."""
+        async with self._tools_lock:
+            if self._tools is None:
+                tools_result = await self.client_session.list_tools()
+                self._tools = tools_result.tools
+            return self._tools
+
+    @property
+    def result_cache(self) -> ToolResultCache:
+        return self._result_cache
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> types.CallToolResult:
+        """
+        Calls the tool, the result of a cacheable tool is reused within its TTL, while
+        calling the other tools drops the cached results of the server.
+        """
+        tool = next((t for t in await self.list_tools() if t.name == tool_name), None)
+        return await cached_call_tool(
+            self._result_cache,
+            tool_cache_ttl(tool, self.cache_tools, self.cache_ttl),
+            self.name,
+            tool_name,
+            arguments,
+            session=self.client_session,
+            supervisor=self.supervisor,
+            shared_server=self.shared_server,
+            replayable=is_replayable(tool),
+        )
+
     # Deprecated
     def _build_tool_schemas(self) -> List[dict]:
         tool_schemas = [
@@ -36,7 +118,12 @@ class MCPServer(BaseModel):
     ) -> List[FunctionTool]:
         """Convert MCP tools into agent SDK tools."""
 
-        tools_result = await self.client_session.list_tools()
+        tools = await self.list_tools()
+        if (
+            self._function_tools is not None
+            and self._tool_validators is tool_validators
+        ):
+            return self._function_tools
 
         async def on_invoke_tool(
             ctx: RunContextWrapper[Any], parameters: str, tool_name: str
@@ -56,14 +143,17 @@ class MCPServer(BaseModel):
                         return result
 
             # add access control in here
-            result: types.CallToolResult = await self.client_session.call_tool(
-                tool_name, params
-            )
+            result: types.CallToolResult = await self.call_tool(tool_name, params)
             if result.isError:
                 return "".join(c.text for c in result.content)
-            return str(result)
+            return tool_result_text(
+                result.content,
+                tool_result_budget(
+                    tool_name, self.result_budgets, self.max_result_bytes
+                ),
+            )
 
-        return [
+        function_tools = [
             FunctionTool(
                 name=tool.name,
                 description=tool.description,
@@ -73,6 +163,10 @@ class MCPServer(BaseModel):
                 ),
                 strict_json_schema=False,
             )
-            for tool in tools_result.tools
+            for tool in tools
             if tool.name not in self.exclude_tools
         ]
+        # the tools refer to the validators, so reuse them only for the same ones
+        self._function_tools = function_tools
+        self._tool_validators = tool_validators
+        return function_tools
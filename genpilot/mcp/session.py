@@ -0,0 +1,90 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, suppress
+from typing import Callable, List, Optional, Tuple
+
+from mcp import ClientSession, types
+
+from genpilot.mcp.transport import ServerParameters, open_transport
+
+# the default seconds to wait for a server to start and initialize
+DEFAULT_STARTUP_TIMEOUT = 60.0
+
+
+class NotifyingClientSession(ClientSession):
+    """A client session forwarding the server notifications to its handlers,
+    e.g. to refresh the cached tools on 'notifications/tools/list_changed'."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.notification_handlers: List[
+            Callable[[types.ServerNotification], None]
+        ] = []
+
+    async def _received_notification(
+        self, notification: types.ServerNotification
+    ) -> None:
+        await super()._received_notification(notification)
+        for handler in self.notification_handlers:
+            handler(notification)
+
+
+async def start_session(
+    exit_stack: AsyncExitStack,
+    server_params: ServerParameters,
+    timeout: Optional[float] = DEFAULT_STARTUP_TIMEOUT,
+) -> Tuple[NotifyingClientSession, float]:
+    """Start the stdio server, or connect to the remote one, and initialize its client
+    session.
+
+    The transport and session contexts are entered and exited inside a dedicated
+    task, since their cancel scopes must not cross tasks, so many servers can be
+    started concurrently. The task is closed along with the exit stack.
+
+    Args:
+        exit_stack (AsyncExitStack): The exit stack to close the session with.
+        server_params (ServerParameters): The stdio server to start, or the remote
+            server to connect to over SSE or streamable HTTP.
+        timeout (float, optional): The seconds to wait for the server to be ready.
+
+    Returns:
+        Tuple[NotifyingClientSession, float]: The initialized session and its startup seconds.
+
+    Raises:
+        asyncio.TimeoutError: If the server isn't ready within the timeout.
+    """
+    ready = asyncio.get_running_loop().create_future()
+    closing = asyncio.Event()
+
+    async def serve():
+        try:
+            async with open_transport(server_params) as (read, write):
+                async with NotifyingClientSession(read, write) as session:
+                    await session.initialize()
+                    ready.set_result(session)
+                    await closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+                return
+            raise
+
+    start = time.perf_counter()
+    task = asyncio.create_task(serve())
+    try:
+        session = await asyncio.wait_for(asyncio.shield(ready), timeout)
+    except BaseException:
+        ready.cancel()
+        task.cancel()
+        with suppress(BaseException):
+            await task
+        raise
+    startup_time = time.perf_counter() - start
+
+    async def close():
+        closing.set()
+        with suppress(Exception):
+            await task
+
+    exit_stack.push_async_callback(close)
+    return session, startup_time
@@ -0,0 +1,292 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack, suppress
+from typing import Callable, Dict, List, Optional
+
+import anyio
+from mcp import types
+from mcp.shared.exceptions import McpError
+from rich.console import Console
+
+from genpilot.mcp.session import (
+    DEFAULT_STARTUP_TIMEOUT,
+    NotifyingClientSession,
+    start_session,
+)
+from genpilot.mcp.transport import ServerParameters
+
+logger = logging.getLogger(__name__)
+
+# the errors of a dead transport, e.g. the stdio server exited
+TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    EOFError,
+)
+
+# the errors of sending a request to a dead transport, it never reached the server
+UNSENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+# the error of the requests in flight when the session is closed, e.g. the server died
+CONNECTION_CLOSED = getattr(types, "CONNECTION_CLOSED", -32000)
+
+
+def is_transport_error(e: BaseException) -> bool:
+    """Whether the error means the transport of the session is dead."""
+    if isinstance(e, McpError):
+        return e.error.code == CONNECTION_CLOSED
+    return isinstance(e, TRANSPORT_ERRORS)
+
+
+def is_replayable(tool: Optional[types.Tool]) -> bool:
+    """
+    Whether the tool may be called again when its call was lost in flight, i.e. the
+    server annotates it as read-only or idempotent.
+    """
+    annotations = getattr(tool, "annotations", None)
+    return bool(
+        annotations
+        and (
+            getattr(annotations, "readOnlyHint", None)
+            or getattr(annotations, "idempotentHint", None)
+        )
+    )
+
+
+def lost_call_error(name: str, tool_name: str, reason) -> ConnectionError:
+    return ConnectionError(
+        f"MCP server '{name}' died while calling '{tool_name}', it may have run "
+        f"already, so it isn't retried: {reason}"
+    )
+
+
+class SupervisedSession:
+    """The session of a supervised server, replaced on every restart."""
+
+    def __init__(
+        self,
+        name: str,
+        server_params: ServerParameters,
+        startup_timeout: Optional[float] = DEFAULT_STARTUP_TIMEOUT,
+    ):
+        self.name = name
+        self.server_params = server_params
+        self.startup_timeout = startup_timeout
+        self.session: Optional[NotifyingClientSession] = None
+        self.restarts = 0
+        # bumped on every restart, so a stale failure doesn't restart the new session
+        self.generation = 0
+        self.ready = asyncio.Event()
+        self.failed = asyncio.Event()
+        # attached to every new session
+        self.notification_handlers: List[
+            Callable[[types.ServerNotification], None]
+        ] = []
+        # called with the new session after a restart
+        self.on_restart: List[Callable[[NotifyingClientSession], None]] = []
+        self._exit_stack = AsyncExitStack()
+        self._restart_task: Optional[asyncio.Task] = None
+
+
+class SessionSupervisor:
+    """
+    Keeps the MCP server sessions alive: pings them periodically, and restarts only the
+    server whose transport is dead, in the background. The calls going through the
+    supervisor wait for the restart and are retried with backoff, instead of failing
+    or restarting every server.
+
+    A call is retried when it never reached the server, e.g. the session was already
+    dead. A call lost in flight might have run already, it's retried only for the
+    replayable tools, see `is_replayable`, and fails otherwise.
+
+    Args:
+        ping_interval (float): The seconds between the health checks.
+        ping_timeout (float): The seconds a ping may take before the session is dead.
+        max_retries (int): The times to retry a call after the transport died.
+        backoff (float): The seconds to wait before the first retry, doubled each time.
+        max_backoff (float): The max seconds to wait between the retries.
+    """
+
+    def __init__(
+        self,
+        ping_interval: float = 15.0,
+        ping_timeout: float = 5.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+    ):
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.servers: Dict[str, SupervisedSession] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(
+        self,
+        name: str,
+        server_params: ServerParameters,
+        startup_timeout: Optional[float] = DEFAULT_STARTUP_TIMEOUT,
+        notification_handlers: List[Callable[[types.ServerNotification], None]] = None,
+    ) -> SupervisedSession:
+        """
+        Starts the server and supervises it from now on.
+
+        Raises:
+            asyncio.TimeoutError: If the server isn't ready within the timeout.
+        """
+        previous = self.servers.pop(name, None)
+        if previous is not None:
+            await self._stop(previous)
+
+        server = SupervisedSession(name, server_params, startup_timeout)
+        server.notification_handlers.extend(notification_handlers or [])
+        server.session, _ = await start_session(
+            server._exit_stack, server_params, startup_timeout
+        )
+        server.session.notification_handlers.extend(server.notification_handlers)
+        server.ready.set()
+        self.servers[name] = server
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+        return server
+
+    async def call_tool(
+        self, name: str, tool_name: str, arguments: dict, replayable: bool = False
+    ) -> types.CallToolResult:
+        """
+        Calls the tool on the current session of the server, waiting for it to restart
+        and retrying with backoff if the transport dies.
+
+        Args:
+            replayable (bool): Whether to retry the call lost in flight as well.
+
+        Raises:
+            ConnectionError: If the server is still unavailable after the retries, or
+                the call of a tool that isn't replayable was lost in flight.
+        """
+        server = self.servers[name]
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                await asyncio.sleep(delay)
+            try:
+                await asyncio.wait_for(server.ready.wait(), server.startup_timeout)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"not ready in {server.startup_timeout}s")
+                continue
+
+            generation, failed = server.generation, server.failed
+            call = asyncio.ensure_future(server.session.call_tool(tool_name, arguments))
+            dead = asyncio.ensure_future(failed.wait())
+            try:
+                await asyncio.wait({call, dead}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                dead.cancel()
+                if not call.done():
+                    call.cancel()
+            if not call.done() or call.cancelled():
+                error = "the session died during the call"
+                if not replayable:
+                    raise lost_call_error(name, tool_name, error)
+                continue
+            try:
+                return call.result()
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                error = e
+                self.fail(server, generation, f"{e}" or type(e).__name__)
+                if not replayable and not isinstance(e, UNSENT_ERRORS):
+                    raise lost_call_error(name, tool_name, e) from e
+        raise ConnectionError(f"MCP server '{name}' is unavailable: {error}")
+
+    def fail(self, server: SupervisedSession, generation: int, reason=None):
+        """Marks the session of the generation dead and restarts the server."""
+        if self._closed or generation != server.generation or server.failed.is_set():
+            return
+        Console().print(
+            f"[yellow]MCP server '{server.name}' is down, restarting: {reason}[/yellow]"
+        )
+        server.ready.clear()
+        server.failed.set()
+        server._restart_task = asyncio.create_task(self._restart(server))
+
+    async def _restart(self, server: SupervisedSession):
+        # close the dead session, its process and task, the others are left running
+        exit_stack, server._exit_stack = server._exit_stack, AsyncExitStack()
+        with suppress(Exception):
+            await exit_stack.aclose()
+
+        attempt = 0
+        while not self._closed:
+            try:
+                session, _ = await start_session(
+                    server._exit_stack, server.server_params, server.startup_timeout
+                )
+                break
+            except Exception as e:
+                attempt += 1
+                delay = min(self.backoff * 2**attempt, self.max_backoff)
+                logger.warning(
+                    f"failed to restart MCP server '{server.name}': {e}, "
+                    f"retrying in {delay}s"
+                )
+                await asyncio.sleep(delay)
+        else:
+            return
+
+        session.notification_handlers.extend(server.notification_handlers)
+        server.session = session
+        server.generation += 1
+        server.restarts += 1
+        server.failed = asyncio.Event()
+        for on_restart in server.on_restart:
+            on_restart(session)
+        server.ready.set()
+
+    async def _watch(self):
+        while not self._closed:
+            await asyncio.sleep(self.ping_interval)
+            await asyncio.gather(
+                *(
+                    self._ping(server)
+                    for server in self.servers.values()
+                    if server.ready.is_set()
+                )
+            )
+
+    async def _ping(self, server: SupervisedSession):
+        generation = server.generation
+        try:
+            await asyncio.wait_for(server.session.send_ping(), self.ping_timeout)
+        except asyncio.TimeoutError:
+            self.fail(server, generation, f"no ping response in {self.ping_timeout}s")
+        except Exception as e:
+            # an error response means the server is still alive
+            if not isinstance(e, McpError) or is_transport_error(e):
+                self.fail(server, generation, f"{e}" or type(e).__name__)
+
+    async def _stop(self, server: SupervisedSession):
+        task = server._restart_task
+        if task and not task.done():
+            task.cancel()
+            with suppress(BaseException):
+                await task
+        with suppress(Exception):
+            await server._exit_stack.aclose()
+
+    async def close(self):
+        self._closed = True
+        if self._watch_task and not self._watch_task.done():
+            self._watch_task.cancel()
+            with suppress(BaseException):
+                await self._watch_task
+        for server in self.servers.values():
+            await self._stop(server)
+        self.servers.clear()
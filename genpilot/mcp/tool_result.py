@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional
+
+# the max bytes of a tool result kept in the memory, unless configured otherwise
+DEFAULT_MAX_RESULT_BYTES = 16 * 1024
+
+
+def tool_result_budget(
+    tool_name: str, result_budgets: Dict[str, int], max_result_bytes: int
+) -> int:
+    """The max bytes of the tool result, the configured ones or the server's, 0 means
+    unbounded."""
+    return int(result_budgets.get(tool_name, max_result_bytes) or 0)
+
+
+def content_text(content: Any) -> str:
+    """
+    The text of an MCP content: the text itself, while the blobs, like the images or the
+    binary resources, are replaced by a reference to them, e.g. the resource uri.
+    """
+    kind = getattr(content, "type", None)
+    if kind == "text":
+        return content.text
+    if kind == "resource":
+        resource = content.resource
+        text = getattr(resource, "text", None)
+        if text is not None:
+            return text
+        blob = getattr(resource, "blob", None) or ""
+        return (
+            f"[resource {resource.uri} ({resource.mimeType}, "
+            f"{len(blob)} bytes base64) omitted]"
+        )
+    if kind == "resource_link":
+        return f"[resource {content.uri}]"
+    if hasattr(content, "data"):
+        # image or audio
+        return (
+            f"[{kind} ({content.mimeType}, {len(content.data)} bytes base64) omitted]"
+        )
+    return str(content)
+
+
+def truncate_text(text: str, max_bytes: int) -> str:
+    """
+    Keeps the head and the tail of the text within the bytes, cut at the line
+    boundaries, with a note of the bytes left out in between.
+    """
+    data = text.encode("utf-8")
+    if not max_bytes or len(data) <= max_bytes:
+        return text
+    # the most relevant lines are usually first, e.g. the headers or the first errors
+    head = data[: max_bytes * 2 // 3]
+    tail = data[len(data) - max_bytes // 3 :]
+    if b"\n" in head:
+        head = head[: head.rindex(b"\n")]
+    if b"\n" in tail:
+        tail = tail[tail.index(b"\n") + 1 :]
+    omitted = len(data) - len(head) - len(tail)
+    return (
+        f"{head.decode('utf-8', errors='ignore')}\n"
+        f"... [{omitted} of {len(data)} bytes truncated] ...\n"
+        f"{tail.decode('utf-8', errors='ignore')}"
+    )
+
+
+def tool_result_text(contents: List[Any], max_bytes: Optional[int] = None) -> str:
+    """
+    Normalizes the contents of a MCP tool result into the text kept in the memory,
+    bounded by the bytes, instead of the repr of the content objects.
+    """
+    if not isinstance(contents, list):
+        contents = [contents]
+    text = "\n".join(content_text(content) for content in contents)
+    return truncate_text(text, max_bytes)
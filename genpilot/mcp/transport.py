@@ -0,0 +1,164 @@
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, Literal, Optional, Tuple, Union
+
+import httpx
+from mcp import StdioServerParameters
+from mcp.client.stdio import stdio_client
+from pydantic import BaseModel
+
+SSE = "sse"
+STREAMABLE_HTTP = "streamable-http"
+
+
+class RemoteServerParameters(BaseModel):
+    """Connection parameters of a remote MCP server, over SSE or streamable HTTP.
+
+    Attributes:
+        url (str): The endpoint of the server, e.g. http://mcp.example.com/mcp
+        transport (str): Either "sse" or "streamable-http"
+        headers (dict[str, str]): The headers of every request, e.g. the authorization
+        timeout (float): Seconds to wait for a request
+        sse_read_timeout (float): Seconds to wait for an event of the stream
+    """
+
+    url: str
+    transport: Literal["sse", "streamable-http"] = STREAMABLE_HTTP
+    headers: Dict[str, str] = {}
+    timeout: float = 30
+    sse_read_timeout: float = 300
+
+
+ServerParameters = Union[StdioServerParameters, RemoteServerParameters]
+
+
+def remote_transport(url: str, transport: Optional[str] = None) -> str:
+    """The transport of the url, SSE for the legacy '/sse' endpoints by default."""
+    if transport:
+        return transport
+    return SSE if url.rstrip("/").endswith("/sse") else STREAMABLE_HTTP
+
+
+class PooledAsyncClient(httpx.AsyncClient):
+    """
+    An HTTP client leased to the sessions of the pool. Entering it leases it, exiting
+    it returns it, so the connection pool is only closed when the last session exits.
+    """
+
+    def __init__(self, pool: "HttpClientPool", key: Tuple, **kwargs):
+        super().__init__(**kwargs)
+        self._pool = pool
+        self._key = key
+        self._leases = 0
+
+    async def __aenter__(self) -> "PooledAsyncClient":
+        self._leases += 1
+        if self._leases == 1:
+            await super().__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._leases -= 1
+        if self._leases > 0:
+            return
+        self._pool.discard(self._key, self)
+        await super().__aexit__(*exc_info)
+
+
+class HttpClientPool:
+    """
+    Shares the HTTP clients of the remote MCP sessions with the same headers and
+    timeouts, so the agents of the process talking to one central server reuse its
+    kept-alive connections instead of opening their own. A client is closed once the
+    last session using it is closed.
+
+    Args:
+        max_connections (int): The max connections of a client.
+        max_keepalive_connections (int): The max idle connections kept alive.
+        keepalive_expiry (float): The seconds an idle connection is kept alive.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._clients: Dict[Tuple, PooledAsyncClient] = {}
+
+    def factory(self, headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+        """The `httpx_client_factory` of the MCP HTTP transports."""
+        # the connections are bound to the event loop they're opened in
+        key = (
+            id(asyncio.get_running_loop()),
+            tuple(sorted((headers or {}).items())),
+            repr(timeout),
+            id(auth),
+        )
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = PooledAsyncClient(
+                self,
+                key,
+                headers=headers,
+                timeout=timeout,
+                auth=auth,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._clients[key] = client
+        return client
+
+    def discard(self, key: Tuple, client: PooledAsyncClient):
+        if self._clients.get(key) is client:
+            del self._clients[key]
+
+
+# the HTTP clients shared by the remote sessions of the process
+http_client_pool = HttpClientPool()
+
+
+@asynccontextmanager
+async def open_transport(server_params: ServerParameters) -> AsyncIterator[Tuple]:
+    """Opens the stdio, SSE or streamable HTTP transport of the server, yields its read
+    and write streams."""
+    if isinstance(server_params, StdioServerParameters):
+        async with stdio_client(server_params) as (read, write):
+            yield read, write
+        return
+
+    if server_params.transport == SSE:
+        from mcp.client.sse import sse_client as client
+    else:
+        try:
+            from mcp.client.streamable_http import streamablehttp_client as client
+        except ImportError:
+            raise ImportError(
+                "The streamable HTTP transport requires mcp>=1.8, "
+                "upgrade it or use the 'sse' transport."
+            )
+
+    options = {
+        "headers": server_params.headers or None,
+        "timeout": server_params.timeout,
+        "sse_read_timeout": server_params.sse_read_timeout,
+    }
+    parameters = inspect.signature(client).parameters
+    for name in ("timeout", "sse_read_timeout"):
+        # some versions take the timeouts as timedelta
+        if isinstance(parameters[name].default, timedelta):
+            options[name] = timedelta(seconds=options[name])
+    if "httpx_client_factory" in parameters:
+        options["httpx_client_factory"] = http_client_pool.factory
+
+    async with client(server_params.url, **options) as streams:
+        # the streamable HTTP transport also yields the session id getter
+        yield streams[0], streams[1]
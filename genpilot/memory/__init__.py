@@ -1,2 +1,27 @@
-from ..abc.memory import IMemory
-from .buffer_memory import BufferMemory
+import importlib
+from typing import TYPE_CHECKING
+
+# the memories backed by litellm are loaded on first use
+_LAZY_ATTRIBUTES = {
+    "IMemory": "..abc.memory",
+    "BufferMemory": ".buffer_memory",
+    "TokenBufferMemory": ".token_buffer_memory",
+    "SummaryBufferMemory": ".summary_buffer_memory",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from ..abc.memory import IMemory
+    from .buffer_memory import BufferMemory
+    from .token_buffer_memory import TokenBufferMemory
+    from .summary_buffer_memory import SummaryBufferMemory
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,5 @@
-from typing import List, Any
+from collections import deque
+from typing import Deque, List, Any, Optional
 from openai.types.chat import (
     ChatCompletionMessageParam,
 )
@@ -8,38 +9,90 @@ from ..abc.memory import IMemory
 
 class BufferMemory(IMemory):
     def __init__(self, size=10):
-        self._messages: List[ChatCompletionMessageParam] = []
-        self._size = size
+        # the system message is pinned, the rest are evicted from the left in O(1)
         self._system_message = None
+        self._messages: Deque[ChatCompletionMessageParam] = deque()
+        self._size = size
+        # the assembled messages returned by get(), rebuilt only on change
+        self._snapshot: Optional[List[ChatCompletionMessageParam]] = None
+
+    def __len__(self):
+        return len(self._messages) + (self._system_message is not None)
 
     def add(
         self, message: ChatCompletionMessageParam | List[ChatCompletionMessageParam]
     ):
-        if isinstance(message, list):
-            self._messages.extend(message)
-        else:
-            self._messages.append(message)
+        messages = message if isinstance(message, list) else [message]
+        for message in messages:
             if message["role"] == "system":
                 self._system_message = message
+            else:
+                self._messages.append(message)
+        self._snapshot = None
 
         # clean up the over size messages
-        while len(self._messages) > self._size:
-            del self._messages[1]
-            if self._messages[1]["role"] == "tool":  # if it is tool call response
-                del self._messages[1]
+        while len(self) > self._size and self._messages:
+            self._evict()
+
+    def _evict(self) -> List[ChatCompletionMessageParam]:
+        """
+        Evicts the oldest message along with the responses of its tool calls, or the
+        orphan tool responses following it.
+        """
+        message = self._messages.popleft()
+        evicted = [message]
+        tool_call_ids = {
+            tool_call["id"] for tool_call in (message.get("tool_calls") or [])
+        }
+        while self._messages and self._messages[0]["role"] == "tool":
+            if message["role"] != "tool" and (
+                self._messages[0].get("tool_call_id") not in tool_call_ids
+            ):
+                break
+            evicted.append(self._messages.popleft())
+        return evicted
 
     def pop(self, index=-1) -> ChatCompletionMessageParam:
-        return self._messages.pop(index)
+        offset = 0 if self._system_message is None else 1
+        if index < 0:
+            index += len(self)
+        self._snapshot = None
+        if offset and index == 0:
+            message, self._system_message = self._system_message, None
+            return message
+        if index == len(self) - 1:
+            return self._messages.pop()
+        message = self._messages[index - offset]
+        del self._messages[index - offset]
+        return message
 
     def last(self, default_index=1):
-        return self._messages[-default_index]
+        if default_index <= len(self._messages):
+            return self._messages[-default_index]
+        return self.get()[-default_index]
 
     def get(self, start=-1, end=-1) -> List[ChatCompletionMessageParam]:
+        """
+        Returns the messages, the whole history is a cached list shared between the
+        calls until the memory changes, so don't modify it in place.
+        """
+        if self._snapshot is None:
+            self._snapshot = self._assemble()
+
+        if (start == -1 or start <= 0) and (end == -1 or end >= len(self._snapshot)):
+            return self._snapshot
         if start == -1 or start < 0:
             start = 0
-        if end == -1 or end > len(self._messages):
-            end = len(self._messages)
-        return self._messages[start:end]
+        if end == -1 or end > len(self._snapshot):
+            end = len(self._snapshot)
+        return self._snapshot[start:end]
+
+    def _assemble(self) -> List[ChatCompletionMessageParam]:
+        messages = list(self._messages)
+        if self._system_message is not None:
+            messages.insert(0, self._system_message)
+        return messages
 
     def clear(self) -> None:
-        self._messages = [self._system_message]
+        self._messages.clear()
+        self._snapshot = None
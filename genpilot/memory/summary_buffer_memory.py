@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from typing import List, Optional
+from openai.types.chat import (
+    ChatCompletionMessageParam,
+    ChatCompletionSystemMessageParam,
+)
+from litellm import acompletion
+
+from .buffer_memory import BufferMemory
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Progressively summarize the conversation, adding onto the previous summary and returning a new summary.
+Keep the facts, decisions, tool results and open questions the assistant needs to continue the task. Be concise.
+
+Previous summary:
+{summary}
+
+New messages:
+{messages}
+
+New summary:"""
+
+
+class SummaryBufferMemory(BufferMemory):
+    """
+    A tiered memory keeping the recent messages verbatim, while the evicted ones are
+    folded into a rolling summary, injected after the system message. The summary
+    is made by a cheaper model in a background task, so reasoning doesn't wait for
+    it and uses the latest summary available.
+
+    Args:
+        model (str): The model to summarize the evicted messages.
+        size (int): The max messages kept verbatim, including the system message.
+        model_config (dict, optional): The completion options of the summary model.
+    """
+
+    def __init__(self, model: str, size=10, model_config: dict = None):
+        super().__init__(size=size)
+        self._model = model
+        self._model_config = model_config or {}
+        self._summary = ""
+        # evicted messages waiting to be folded into the summary
+        self._pending: List[ChatCompletionMessageParam] = []
+        self._task: Optional[asyncio.Task] = None
+        # bumped on clear, drops the summary of the previous conversation
+        self._generation = 0
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    def add(
+        self, message: ChatCompletionMessageParam | List[ChatCompletionMessageParam]
+    ):
+        super().add(message)
+        self._schedule()
+
+    def _evict(self) -> List[ChatCompletionMessageParam]:
+        evicted = super()._evict()
+        self._pending.extend(evicted)
+        return evicted
+
+    def _assemble(self) -> List[ChatCompletionMessageParam]:
+        messages = super()._assemble()
+        if self._summary:
+            index = 0 if self._system_message is None else 1
+            messages.insert(
+                index,
+                ChatCompletionSystemMessageParam(
+                    role="system",
+                    name="summary",
+                    content=f"Summary of the earlier conversation:\n{self._summary}",
+                ),
+            )
+        return messages
+
+    def _schedule(self):
+        if not self._pending or (self._task and not self._task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop, summarize on the next add within one
+            return
+        self._task = loop.create_task(self._summarize())
+
+    async def _summarize(self):
+        while self._pending:
+            messages, self._pending = self._pending, []
+            generation = self._generation
+            try:
+                response = await acompletion(
+                    model=self._model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": SUMMARY_PROMPT.format(
+                                summary=self._summary or "(empty)",
+                                messages=self.format_messages(messages),
+                            ),
+                        }
+                    ],
+                    **self._model_config,
+                )
+                summary = response.choices[0].message.content
+            except Exception as e:
+                logger.warning(f"failed to summarize the evicted messages: {e}")
+                continue
+            if generation == self._generation and summary:
+                self._summary = summary.strip()
+                self._snapshot = None
+
+    async def wait(self):
+        """Waits for the running summarization, if any."""
+        if self._task:
+            await self._task
+
+    @staticmethod
+    def format_messages(messages: List[ChatCompletionMessageParam]) -> str:
+        lines = []
+        for message in messages:
+            speaker = message.get("name") or message["role"]
+            content = message.get("content") or ""
+            if message.get("tool_calls"):
+                calls = ", ".join(
+                    f"{call['function']['name']}({call['function']['arguments']})"
+                    for call in message["tool_calls"]
+                )
+                content = f"{content} [tool calls: {calls}]".strip()
+            if not isinstance(content, str):
+                content = json.dumps(content, default=str)
+            lines.append(f"{message['role']}({speaker}): {content}")
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        super().clear()
+        self._summary = ""
+        self._pending = []
+        self._generation += 1
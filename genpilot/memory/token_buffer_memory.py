@@ -0,0 +1,125 @@
+import json
+from collections import deque
+from typing import Deque, List, Tuple
+from openai.types.chat import (
+    ChatCompletionMessageParam,
+)
+import litellm
+
+from ..abc.memory import IMemory
+
+# the context window used when the model info isn't known by litellm
+DEFAULT_CONTEXT_TOKENS = 8192
+
+
+def count_tokens(model: str, message: ChatCompletionMessageParam) -> int:
+    """Estimate the prompt tokens of the message with the model tokenizer,
+    fallback to ~4 characters per token."""
+    try:
+        return litellm.token_counter(model=model, messages=[message])
+    except Exception:
+        return len(json.dumps(message, default=str)) // 4 + 1
+
+
+class TokenBufferMemory(IMemory):
+    """
+    A sliding window memory evicting the oldest messages by the estimated tokens
+    rather than the message count. The system message is always kept, and an
+    assistant tool call is evicted together with its tool results.
+
+    Args:
+        model (str): The model to count the tokens and look up the context window.
+        max_tokens (int, optional): The token budget of the messages. Defaults to
+            the `ratio` of the model input context window.
+        ratio (float): The part of the context window for the messages, the rest
+            is left for the tool schemas and the completion.
+    """
+
+    def __init__(self, model: str, max_tokens: int = None, ratio: float = 0.75):
+        self._model = model
+        self._max_tokens = max_tokens or int(self.context_tokens(model) * ratio)
+        self._system_message = None
+        self._system_tokens = 0
+        # the messages after the system message with their cached token counts
+        self._messages: Deque[Tuple[ChatCompletionMessageParam, int]] = deque()
+        self._tokens = 0
+
+    @staticmethod
+    def context_tokens(model: str) -> int:
+        try:
+            model_info = litellm.get_model_info(model)
+            return model_info.get("max_input_tokens") or DEFAULT_CONTEXT_TOKENS
+        except Exception:
+            return DEFAULT_CONTEXT_TOKENS
+
+    @property
+    def tokens(self) -> int:
+        """The estimated tokens of the messages in memory."""
+        return self._system_tokens + self._tokens
+
+    def add(
+        self, message: ChatCompletionMessageParam | List[ChatCompletionMessageParam]
+    ):
+        messages = message if isinstance(message, list) else [message]
+        for message in messages:
+            tokens = count_tokens(self._model, message)
+            if message["role"] == "system":
+                self._system_message = message
+                self._system_tokens = tokens
+                continue
+            self._messages.append((message, tokens))
+            self._tokens += tokens
+
+        # clean up the over budget messages, but keep the latest one
+        while self.tokens > self._max_tokens and len(self._messages) > 1:
+            self._evict()
+
+    def _evict(self):
+        message, tokens = self._messages.popleft()
+        self._tokens -= tokens
+
+        # drop the tool results of the evicted tool calls, or the orphan ones, even the
+        # latest one, since the providers reject a tool message without its call
+        tool_call_ids = {
+            tool_call["id"] for tool_call in (message.get("tool_calls") or [])
+        }
+        while self._messages and self._messages[0][0]["role"] == "tool":
+            if message["role"] == "tool" or (
+                self._messages[0][0].get("tool_call_id") in tool_call_ids
+            ):
+                _, tokens = self._messages.popleft()
+                self._tokens -= tokens
+            else:
+                break
+
+    def pop(self, index=-1) -> ChatCompletionMessageParam:
+        offset = 0 if self._system_message is None else 1
+        if index < 0:
+            index += len(self._messages) + offset
+        if offset and index == 0:
+            message, self._system_message = self._system_message, None
+            self._system_tokens = 0
+            return message
+        message, tokens = self._messages[index - offset]
+        del self._messages[index - offset]
+        self._tokens -= tokens
+        return message
+
+    def last(self, default_index=1):
+        if default_index <= len(self._messages):
+            return self._messages[-default_index][0]
+        return self.get()[-default_index]
+
+    def get(self, start=-1, end=-1) -> List[ChatCompletionMessageParam]:
+        messages = [message for message, _ in self._messages]
+        if self._system_message is not None:
+            messages.insert(0, self._system_message)
+        if start == -1 or start < 0:
+            start = 0
+        if end == -1 or end > len(messages):
+            end = len(messages)
+        return messages[start:end]
+
+    def clear(self) -> None:
+        self._messages.clear()
+        self._tokens = 0
@@ -4,8 +4,12 @@ from rich.syntax import Syntax
 
 
 import os
+import selectors
+import signal
 import sys
 import subprocess
+import time
+from typing import List, Tuple
 
 
 def code_executor(language, code):
@@ -45,34 +49,22 @@ def code_executor(language, code):
             # )
             # print("Matplotlib backend:", backend_process.stdout.strip())
             # Execute Python code
-            process = subprocess.run(
-                [language, "-c", code], text=True, capture_output=True
-            )
+            command = [language, "-c", code]
         elif language == "bash":
-            process = subprocess.run(
-                ["bash", "-c", code],
-                capture_output=True,
-                text=True,
-                # stdout=subprocess.PIPE,
-            )
+            command = ["bash", "-c", code]
         elif language == "nodejs":
-            process = subprocess.run(
-                ["node", "-e", code],
-                # capture_output=True,
-                text=True,
-                # stdout=subprocess.PIPE,
-            )
+            command = ["node", "-e", code]
         else:
             return "Unsupported language. Please specify 'python', 'bash', or 'nodejs'."
 
         # Capture output
-        output = process.stdout
-        error = process.stderr
+        output, error, limit_note = stream_process(command)
 
         # Check for exit code and return both stdout and stderr for debugging
-        if not output and not error:
+        if not output and not error and not limit_note:
             return "Execution completed with no output."
-        return output.strip() if output else f"{error.strip()}"
+        result = output.strip() if output else f"{error.strip()}"
+        return f"{result}\n\n{limit_note}".strip() if limit_note else result
 
     except Exception as e:
         # Print the full traceback for debugging
@@ -81,6 +73,120 @@ def code_executor(language, code):
         return f"An exception occurred: {str(e)}"
 
 
+# the seconds a code execution may run before it's killed
+CODE_TIMEOUT = 60
+# the bytes of each output kept in the result, the head and tail of a longer one
+MAX_KEPT_BYTES = 10000
+# the bytes read from the output before the execution is killed
+MAX_OUTPUT_BYTES = 10 * 1024 * 1024
+
+
+class HeadTailBuffer:
+    """Keeps the head and a rolling tail of a stream within the limit."""
+
+    def __init__(self, limit: int):
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.head_limit = limit // 2
+        self.tail_limit = limit - limit // 2
+        self.size = 0
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if len(self.head) < self.head_limit:
+            room = self.head_limit - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+        self.tail += data
+        if len(self.tail) > self.tail_limit:
+            del self.tail[: len(self.tail) - self.tail_limit]
+
+    def getvalue(self) -> str:
+        head = self.head.decode(errors="replace")
+        tail = self.tail.decode(errors="replace")
+        truncated = self.size - len(self.head) - len(self.tail)
+        if truncated > 0:
+            return f"{head}\n... [{truncated} bytes truncated] ...\n{tail}"
+        return head + tail
+
+
+def stream_process(
+    command: List[str],
+    timeout: float = None,
+    max_output: int = None,
+    max_bytes: int = None,
+) -> Tuple[str, str, str]:
+    """
+    Runs the command and reads its output incrementally, instead of buffering all of
+    it in memory. The process group is killed once the wall-clock or byte limit is hit.
+
+    Args:
+        command (List[str]): The command to run.
+        timeout (float): The seconds the command may run, defaults to CODE_TIMEOUT.
+        max_output (int): The bytes kept of each output, the head and tail of a longer
+            output are kept, defaults to MAX_KEPT_BYTES.
+        max_bytes (int): The bytes read before killing it, defaults to MAX_OUTPUT_BYTES.
+
+    Returns:
+        Tuple[str, str, str]: The stdout, stderr and the note on the hit limit if any.
+    """
+    timeout = timeout or CODE_TIMEOUT
+    max_output = max_output or MAX_KEPT_BYTES
+    max_bytes = max_bytes or MAX_OUTPUT_BYTES
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        # own process group, so the children are killed along with it
+        start_new_session=True,
+    )
+    buffers = {
+        process.stdout: HeadTailBuffer(max_output),
+        process.stderr: HeadTailBuffer(max_output),
+    }
+    deadline = time.monotonic() + timeout
+    timeout_note = f"[Execution timed out after {timeout}s, the process was killed]"
+    limit_note = ""
+    with selectors.DefaultSelector() as selector:
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                limit_note = timeout_note
+                break
+            for key, _ in selector.select(timeout=remaining):
+                data = os.read(key.fileobj.fileno(), 65536)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                buffers[key.fileobj].write(data)
+            if sum(buffer.size for buffer in buffers.values()) > max_bytes:
+                limit_note = (
+                    f"[Output exceeded {max_bytes} bytes, the process was killed]"
+                )
+                break
+
+    if not limit_note:
+        # the process might close its output and keep running
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            limit_note = timeout_note
+    if limit_note:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+    process.wait()
+    process.stdout.close()
+    process.stderr.close()
+    stdout, stderr = buffers.values()
+    return stdout.getvalue(), stderr.getvalue(), limit_note
+
+
 def terminal_code_executor_printer(agent, func_name, func_args):
     import rich
 
@@ -0,0 +1,364 @@
+import base64
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+from genpilot.tools.code_executor import code_executor as _code_executor
+
+# the python and node workers take the requests and send the results over their own
+# pipes, given as the last two arguments, while the fds 1 and 2 go to an output file,
+# so whatever the code or its subprocesses write can't break the protocol. The output
+# of a request is read back from the file, capped to its head and tail, and cleared
+PYTHON_WORKER = r"""
+import io, json, os, sys, traceback
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def read_output(limit):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    size = os.fstat(1).st_size
+    if size <= limit:
+        text = os.pread(1, size, 0).decode(errors="replace")
+    else:
+        half = limit // 2
+        text = (
+            os.pread(1, half, 0).decode(errors="replace")
+            + f"\n... [{size - limit} bytes truncated] ...\n"
+            + os.pread(1, limit - half, size - (limit - half)).decode(errors="replace")
+        )
+    os.ftruncate(1, 0)
+    return text
+
+
+namespace = {"__name__": "__main__"}
+protocol_in = os.fdopen(int(sys.argv[-2]), "r")
+protocol_out = os.fdopen(int(sys.argv[-1]), "w")
+sys.stdin = io.StringIO()
+for line in protocol_in:
+    request = json.loads(line)
+    try:
+        exec(compile(request["code"], "<code>", "exec"), namespace)
+    except SystemExit:
+        pass
+    except BaseException:
+        error, value, trace = sys.exc_info()
+        traceback.print_exception(error, value, trace.tb_next)
+    output = read_output(request["limit"])
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+    if sys.platform != "darwin":
+        maxrss *= 1024
+    protocol_out.write(json.dumps({"output": output, "maxrss": maxrss}) + "\n")
+    protocol_out.flush()
+"""
+
+# the node worker runs the requests in a persistent vm context
+NODE_WORKER = r"""
+const fs = require("fs");
+const readline = require("readline");
+const vm = require("vm");
+const [requestFd, replyFd] = process.argv.slice(-2).map(Number);
+const context = vm.createContext({ console, require, process, Buffer, setTimeout, setInterval, clearTimeout, clearInterval });
+const read = (length, position) => {
+  const buffer = Buffer.alloc(length);
+  return buffer.toString("utf8", 0, fs.readSync(1, buffer, 0, length, position));
+};
+const readOutput = (limit) => {
+  const size = fs.fstatSync(1).size;
+  let text = read(size, 0);
+  if (size > limit) {
+    const half = Math.floor(limit / 2);
+    text = read(half, 0) + `\n... [${size - limit} bytes truncated] ...\n` + read(limit - half, size - (limit - half));
+  }
+  fs.ftruncateSync(1, 0);
+  return text;
+};
+readline.createInterface({ input: fs.createReadStream(null, { fd: requestFd }) }).on("line", (line) => {
+  const request = JSON.parse(line);
+  try {
+    vm.runInContext(request.code, context);
+  } catch (error) {
+    console.error(String(error && error.stack ? error.stack : error));
+  }
+  const output = readOutput(request.limit);
+  fs.writeSync(replyFd, JSON.stringify({ output, maxrss: process.memoryUsage().rss }) + "\n");
+});
+"""
+
+
+def _output_file() -> int:
+    """An unlinked file appended by the worker output, it's truncated per request."""
+    fd, path = tempfile.mkstemp(prefix="genpilot-worker-")
+    try:
+        return os.open(path, os.O_RDWR | os.O_APPEND)
+    finally:
+        os.close(fd)
+        os.unlink(path)
+
+
+class CodeWorker:
+    """
+    A warm interpreter process running the code of one language, keeping the state,
+    e.g. the imports and variables, between the calls.
+    """
+
+    def __init__(self, language: str):
+        self.language = language
+        self.calls = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._requests = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._sentinel = uuid.uuid4().hex
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        if self.language in ("python", "python3"):
+            command = [sys.executable, "-u", "-c", PYTHON_WORKER]
+        elif self.language == "bash":
+            command = ["bash", "--noprofile", "--norc"]
+        elif self.language == "nodejs":
+            command = ["node", "-e", NODE_WORKER]
+        else:
+            raise ValueError(f"Unsupported language: {self.language}")
+
+        if self.language == "bash":
+            # the output and the sentinel of a request share the stdout
+            self._process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                # own process group, so the children are killed along with the worker
+                start_new_session=True,
+            )
+            self._requests, replies = self._process.stdin, self._process.stdout
+        else:
+            request_read, request_write = os.pipe()
+            reply_read, reply_write = os.pipe()
+            output = _output_file()
+            try:
+                self._process = subprocess.Popen(
+                    command + [str(request_read), str(reply_write)],
+                    stdin=subprocess.DEVNULL,
+                    stdout=output,
+                    stderr=output,
+                    pass_fds=(request_read, reply_write),
+                    start_new_session=True,
+                )
+            except BaseException:
+                os.close(request_write)
+                os.close(reply_read)
+                raise
+            finally:
+                os.close(request_read)
+                os.close(reply_write)
+                os.close(output)
+            self._requests = os.fdopen(request_write, "w", buffering=1)
+            replies = os.fdopen(reply_read, "r")
+        self._lines = queue.Queue()
+        self.calls = 0
+        threading.Thread(
+            target=self._read, args=(replies, self._lines), daemon=True
+        ).start()
+
+    @staticmethod
+    def _read(replies, lines: queue.Queue):
+        with replies:
+            for line in replies:
+                lines.put(line)
+        lines.put(None)  # the worker exited
+
+    def run(self, code: str, timeout: float, limit: int) -> Tuple[str, int]:
+        """
+        Runs the code in the worker.
+
+        Returns:
+            Tuple[str, int]: The capped output and the worker memory usage in bytes.
+
+        Raises:
+            TimeoutError: If the code doesn't finish in time, the worker is killed.
+            ChildProcessError: If the worker exits while running the code.
+        """
+        with self._lock:
+            if not self.alive:
+                self.start()
+            self.calls += 1
+            if self.language == "bash":
+                return self._run_bash(code, timeout, limit), 0
+            self._send(json.dumps({"code": code, "limit": limit}) + "\n")
+            line = self._next_line(timeout)
+            result = json.loads(line)
+            return result["output"], result.get("maxrss", 0)
+
+    def _run_bash(self, code: str, timeout: float, limit: int) -> str:
+        # eval the encoded code, a syntax error or a stdin read won't break the worker
+        encoded = base64.b64encode(code.encode()).decode()
+        self._send(
+            f"eval \"$(printf %s '{encoded}' | base64 -d)\" < /dev/null 2>&1; "
+            f'echo "{self._sentinel} $?"\n'
+        )
+        deadline = time.monotonic() + timeout
+        head, tail = [], deque()
+        head_size, tail_size, size = 0, 0, 0
+        done = False
+        while not done:
+            line = self._next_line(max(0.0, deadline - time.monotonic()))
+            if self._sentinel in line:
+                # the output might not end with a newline before the sentinel
+                line = line[: line.index(self._sentinel)]
+                done = True
+            size += len(line)
+            # keep the head and tail of the output only
+            if head_size < limit // 2:
+                head.append(line)
+                head_size += len(line)
+            else:
+                tail.append(line)
+                tail_size += len(line)
+                while len(tail) > 1 and tail_size > limit - limit // 2:
+                    tail_size -= len(tail.popleft())
+        output = "".join(head) + "".join(tail)
+        if size > len(output):
+            output = (
+                "".join(head)
+                + f"\n... [{size - len(output)} characters truncated] ...\n"
+                + "".join(tail)
+            )
+        return output
+
+    def _send(self, request: str):
+        try:
+            self._requests.write(request)
+            self._requests.flush()
+        except (BrokenPipeError, OSError):
+            self.close()
+            raise ChildProcessError(f"the {self.language} worker exited")
+
+    def _next_line(self, timeout: float) -> str:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            raise TimeoutError(f"the code didn't finish in {timeout}s")
+        if line is None:
+            code = self._process.wait()
+            self.close()
+            raise ChildProcessError(
+                f"the {self.language} worker exited with code {code}"
+            )
+        return line
+
+    def close(self):
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                self._process.kill()
+        self._process.wait()
+        self._process = None
+        try:
+            self._requests.close()
+        except OSError:
+            pass
+
+
+class CodeWorkerPool:
+    """
+    Keeps warm interpreter workers, one per language and optionally per agent session,
+    instead of starting a process for every code_executor call, so the state carries
+    over between the calls.
+
+    Args:
+        timeout (float): The seconds a call may run before its worker is killed.
+        max_output (int): The max characters of a call output, the head and tail of a
+            longer output are kept.
+        max_memory (int): The worker memory usage in MB to recycle it after a call.
+        max_calls (int, optional): The calls to recycle the worker after.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        max_output: int = 10000,
+        max_memory: int = 1024,
+        max_calls: int = None,
+    ):
+        self.timeout = timeout
+        self.max_output = max_output
+        self.max_memory = max_memory
+        self.max_calls = max_calls
+        self._workers: Dict[Tuple[str, Optional[str]], CodeWorker] = {}
+        self._lock = threading.Lock()
+
+    def worker(self, language: str, session: str = None) -> CodeWorker:
+        if language == "python3":
+            language = "python"
+        with self._lock:
+            key = (language, session)
+            if key not in self._workers:
+                self._workers[key] = CodeWorker(language)
+            return self._workers[key]
+
+    def run(self, language: str, code: str, session: str = None) -> str:
+        if language not in ("python", "python3", "bash", "nodejs"):
+            return "Unsupported language. Please specify 'python', 'bash', or 'nodejs'."
+        worker = self.worker(language, session)
+        try:
+            output, memory = worker.run(code, self.timeout, self.max_output)
+        except TimeoutError:
+            return (
+                f"Execution timed out after {self.timeout}s, the {language} worker "
+                "is restarted and its state is lost."
+            )
+        except ChildProcessError as e:
+            return f"An exception occurred: {e}, its state is lost."
+        except Exception as e:
+            worker.close()
+            return f"An exception occurred: {str(e)}"
+
+        # recycle the worker using too much memory or serving too many calls
+        if memory > self.max_memory * 1024 * 1024 or (
+            self.max_calls and worker.calls >= self.max_calls
+        ):
+            worker.close()
+
+        output = output.strip()
+        return output if output else "Execution completed with no output."
+
+    def executor(self, session: str = None) -> Callable[[str, str], str]:
+        """
+        Returns the code_executor tool backed by the workers of the session, e.g. one per
+        agent, so the agents don't share the interpreter state.
+        """
+
+        def code_executor(language, code):
+            return self.run(language, code, session)
+
+        code_executor.__doc__ = _code_executor.__doc__
+        return code_executor
+
+    def close(self):
+        with self._lock:
+            for worker in self._workers.values():
+                worker.close()
+            self._workers.clear()
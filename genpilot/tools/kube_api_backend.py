@@ -0,0 +1,336 @@
+import json
+import shlex
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+# the server renders the same columns as kubectl in the Table format
+TABLE_ACCEPT = "application/json;as=Table;v=v1;g=meta.k8s.io,application/json"
+
+# the flags served by the backend, the others fall back to the kubectl binary
+VALUE_OPTIONS = {
+    "-n": "namespace",
+    "--namespace": "namespace",
+    "-l": "selector",
+    "--selector": "selector",
+    "--field-selector": "field_selector",
+    "-o": "output",
+    "--output": "output",
+    "-c": "container",
+    "--container": "container",
+    "--tail": "tail",
+    "--since": "since",
+    # resolved by the executor already
+    "--kubeconfig": None,
+    "--context": None,
+    "--request-timeout": None,
+}
+SWITCH_OPTIONS = {
+    "-A": "all_namespaces",
+    "--all-namespaces": "all_namespaces",
+    "-p": "previous",
+    "--previous": "previous",
+    "--timestamps": "timestamps",
+}
+OUTPUTS = {None, "wide", "name", "json", "yaml"}
+
+
+class KubeApiBackend:
+    """
+    Serves the common read commands (get and logs) through the kubernetes
+    Python client instead of forking kubectl, which reloads the kubeconfig, rediscovers
+    the API and opens a new TLS connection on every call. One authenticated ApiClient
+    is kept per kubeconfig and context, its connection pool and API discovery are
+    reused between the calls.
+
+    `run` returns None for the commands it doesn't serve, e.g. pipes, other verbs like
+    describe, whose rendering is kubectl's own, or flags, so the caller falls back to
+    the kubectl binary.
+    """
+
+    def __init__(self):
+        try:
+            import kubernetes  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "The native API backend requires the kubernetes client, "
+                "install it with `pip install kubernetes`."
+            )
+        self._clients: Dict[Tuple[str, str], Tuple[object, str]] = {}
+        # the resources by their names, per dynamic client
+        self._resource_aliases: Dict[object, Dict[str, list]] = {}
+        # a lock per client, so a slow cluster doesn't hold up the others
+        self._locks: Dict[object, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def client(self, kubeconfig: str, context: str = None):
+        """
+        Returns the dynamic client of the kubeconfig and context, along with the
+        namespace of the context, created on the first use.
+        """
+        key = (kubeconfig, context)
+        with self._key_lock(key):
+            if key not in self._clients:
+                from kubernetes import config
+                from kubernetes.dynamic import DynamicClient
+
+                api_client = config.new_client_from_config(
+                    config_file=kubeconfig, context=context
+                )
+                contexts, active = config.list_kube_config_contexts(kubeconfig)
+                if context:
+                    active = next(
+                        (item for item in contexts if item["name"] == context), active
+                    )
+                namespace = (active or {}).get("context", {}).get(
+                    "namespace", "default"
+                )
+                self._clients[key] = (DynamicClient(api_client), namespace)
+            return self._clients[key]
+
+    def run(
+        self, kubeconfig: str, context: str, command: str, timeout: float = None
+    ) -> Optional[Tuple[int, str]]:
+        """
+        Runs the kubectl read command through the API.
+
+        Args:
+            timeout (float): The timeout of each request to the server in seconds.
+
+        Returns:
+            Optional[Tuple[int, str]]: The exit code and the output, which is the error
+                message on failure, e.g. of the server or of an unreachable cluster, or
+                None if the command isn't served by the backend.
+        """
+        request = self.parse(command)
+        if request is None:
+            return None
+
+        from kubernetes.client.exceptions import ApiException
+        from kubernetes.config import ConfigException
+        from kubernetes.dynamic.exceptions import DynamicApiError
+        from urllib3.exceptions import HTTPError
+
+        try:
+            dynamic, namespace = self.client(kubeconfig, context)
+        except (ConfigException, OSError):
+            # kubectl reports the kubeconfig errors in its own words
+            return None
+        except (ApiException, DynamicApiError) as error:
+            return 1, self._error(error)
+        except HTTPError as error:
+            return 1, f"Unable to connect to the server: {error}"
+
+        options = request["options"]
+        options["request_timeout"] = timeout
+        if not options.get("all_namespaces"):
+            options.setdefault("namespace", namespace)
+        try:
+            if request["verb"] == "logs":
+                output = self._logs(dynamic, request["args"], options)
+            else:
+                resource = self._resource(dynamic, request["args"][0])
+                if resource is None:
+                    return None
+                name = request["args"][1] if len(request["args"]) > 1 else None
+                output = self._get(dynamic, resource, name, options)
+        except (ApiException, DynamicApiError) as error:
+            return 1, self._error(error)
+        except (HTTPError, OSError) as error:
+            return 1, f"Unable to connect to the server: {error}"
+        return None if output is None else (0, output)
+
+    @staticmethod
+    def parse(command: str) -> Optional[dict]:
+        """Parses the supported commands, e.g. 'kubectl get pods -n x -o wide'."""
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            return None
+        if len(tokens) < 3 or tokens[0] not in ("kubectl", "oc"):
+            return None
+
+        verb, args, options = None, [], {}
+        tokens = iter(tokens[1:])
+        for token in tokens:
+            flag, _, value = token.partition("=")
+            if flag in VALUE_OPTIONS:
+                if not value:
+                    value = next(tokens, None)
+                    if value is None:
+                        return None
+                if VALUE_OPTIONS[flag]:
+                    options[VALUE_OPTIONS[flag]] = value
+            elif token in SWITCH_OPTIONS:
+                options[SWITCH_OPTIONS[token]] = True
+            elif token.startswith("-"):
+                return None
+            elif verb is None:
+                verb = token
+            else:
+                args.append(token)
+
+        if verb not in ("get", "logs"):
+            return None
+        if options.get("output") not in OUTPUTS:
+            return None
+        # a single resource type, optionally as type/name
+        if len(args) == 1 and "/" in args[0]:
+            args = args[0].split("/", 1)
+        if not args or len(args) > 2 or "," in args[0]:
+            return None
+        if verb == "logs" and len(args) != 1:
+            return None
+        return {"verb": verb, "args": args, "options": options}
+
+    def _resource(self, dynamic, name: str):
+        """Resolves the resource by its kind, plural, singular or short name."""
+        name, _, group = name.partition(".")
+        resources = [
+            resource
+            for resource in self._aliases(dynamic).get(name.lower(), [])
+            if not group or resource.group == group
+        ]
+        if not resources:
+            return None
+        # the preferred version of the core group goes first
+        resources.sort(key=lambda r: (not getattr(r, "preferred", True), r.group != ""))
+        return resources[0]
+
+    def _aliases(self, dynamic) -> Dict[str, list]:
+        """
+        The resources of the client by their lowercase names, built once from the
+        discovery, since every missed `resources.search` rediscovers the whole API.
+        """
+        with self._key_lock(dynamic):
+            if dynamic not in self._resource_aliases:
+                from kubernetes.dynamic.resource import ResourceList
+
+                aliases: Dict[str, list] = {}
+                for resources in dynamic.resources:
+                    for resource in resources:
+                        if isinstance(resource, ResourceList):
+                            continue
+                        names = {
+                            resource.name,
+                            resource.kind,
+                            resource.singular_name,
+                            *(resource.short_names or []),
+                        }
+                        for alias in {name.lower() for name in names if name}:
+                            aliases.setdefault(alias, []).append(resource)
+                self._resource_aliases[dynamic] = aliases
+            return self._resource_aliases[dynamic]
+
+    def _get(self, dynamic, resource, name: str, options: dict) -> str:
+        output = options.get("output")
+        params = {
+            "name": name,
+            "namespace": self._namespace(resource, options),
+            "label_selector": options.get("selector"),
+            "field_selector": options.get("field_selector"),
+            "_request_timeout": options.get("request_timeout"),
+        }
+        if output in ("json", "yaml", "name"):
+            result = dynamic.get(resource, **params).to_dict()
+            if output == "name":
+                items = result.get("items", [result])
+                return "\n".join(
+                    f"{resource.kind.lower()}/{item['metadata']['name']}"
+                    for item in items
+                )
+            if output == "json":
+                return json.dumps(result, indent=4)
+            return yaml.safe_dump(result, sort_keys=False)
+
+        table = dynamic.get(
+            resource, header_params={"Accept": TABLE_ACCEPT}, **params
+        ).to_dict()
+        return self._format_table(
+            table,
+            wide=output == "wide",
+            with_namespace=options.get("all_namespaces") and resource.namespaced,
+        )
+
+    def _logs(self, dynamic, args: List[str], options: dict) -> Optional[str]:
+        from kubernetes import client
+
+        name = args[0]
+        if "/" in name:
+            kind, name = name.split("/", 1)
+            if kind not in ("pod", "pods", "po"):
+                return None
+        params = {
+            "container": options.get("container"),
+            "previous": options.get("previous", False),
+            "timestamps": options.get("timestamps", False),
+            "_request_timeout": options.get("request_timeout"),
+        }
+        if options.get("tail") is not None:
+            params["tail_lines"] = int(options["tail"])
+        if options.get("since"):
+            seconds = self._seconds(options["since"])
+            if seconds is None:
+                return None
+            params["since_seconds"] = seconds
+        core = client.CoreV1Api(dynamic.client)
+        return core.read_namespaced_pod_log(
+            name,
+            options.get("namespace", "default"),
+            **{key: value for key, value in params.items() if value is not None},
+        )
+
+    @staticmethod
+    def _namespace(resource, options: dict) -> Optional[str]:
+        if not resource.namespaced or options.get("all_namespaces"):
+            return None
+        return options.get("namespace")
+
+    @staticmethod
+    def _seconds(duration: str) -> Optional[int]:
+        units = {"s": 1, "m": 60, "h": 3600}
+        if duration[-1:] in units and duration[:-1].isdigit():
+            return int(duration[:-1]) * units[duration[-1]]
+        return None
+
+    @staticmethod
+    def _format_table(table: dict, wide=False, with_namespace=False) -> str:
+        """Renders the server side Table in the kubectl layout."""
+        rows = table.get("rows") or []
+        if not rows:
+            return "No resources found"
+        columns = [
+            (index, column["name"].upper())
+            for index, column in enumerate(table.get("columnDefinitions", []))
+            if wide or column.get("priority", 0) == 0
+        ]
+        lines = [[name for _, name in columns]]
+        for row in rows:
+            cells = [row["cells"][index] for index, _ in columns]
+            lines.append(["" if cell is None else str(cell) for cell in cells])
+        if with_namespace:
+            lines[0].insert(0, "NAMESPACE")
+            for line, row in zip(lines[1:], rows):
+                metadata = (row.get("object") or {}).get("metadata", {})
+                line.insert(0, metadata.get("namespace", ""))
+        widths = [max(len(line[i]) for line in lines) for i in range(len(lines[0]))]
+        return "\n".join(
+            "   ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+            for line in lines
+        )
+
+    @staticmethod
+    def _error(error) -> str:
+        reason, message = getattr(error, "reason", ""), str(error)
+        body = getattr(error, "body", None)
+        try:
+            status = json.loads(body)
+            reason, message = status.get("reason", reason), status["message"]
+        except (TypeError, ValueError, KeyError):
+            pass
+        return f"Error from server ({reason}): {message}"
@@ -1,10 +1,199 @@
+import asyncio
+import functools
 import re
 import os
+import shlex
+import threading
+import time
+from collections import OrderedDict
 import yaml
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
 import subprocess
 
+from genpilot.abc.agent import side_effect_free
+from genpilot.tools.kubectl_output import (
+    Table,
+    rewrite_to_columns,
+    shape_output,
+    structured_output,
+)
+
+# the kubectl verbs only reading the cluster state
+READ_VERBS = {
+    "get",
+    "describe",
+    "logs",
+    "top",
+    "explain",
+    "events",
+    "api-resources",
+    "api-versions",
+    "cluster-info",
+    "version",
+}
+
+# the kubectl global flags followed by a separate value
+VALUE_FLAGS = {
+    "-n",
+    "--namespace",
+    "--context",
+    "--kubeconfig",
+    "--cluster",
+    "--user",
+    "-s",
+    "--server",
+    "--token",
+    "--as",
+    "--request-timeout",
+}
+
+# the shell operators ending the kubectl part of a command, e.g. "| grep x"
+SHELL_OPERATOR = re.compile(r"[|&;<>\n]")
+# the unquoted shell expansions within the kubectl part, which can't be exec'd
+SHELL_EXPANSION = re.compile(r"[$`*?\[\]~{}]")
+# the flags targeting the cluster, replaced by the ones of the registered cluster
+TARGET_FLAG = re.compile(r"^--(kubeconfig|context)(=.*)?$")
+KUBECONFIG_FLAG = re.compile(r"--kubeconfig(?:=|\s+)\S+")
+CONTEXT_FLAG = re.compile(r"--context(?:=|\s+)\S+")
+
+# the commands allowed after a pipe in a read command, e.g. "kubectl get pods | grep x"
+PIPE_FILTERS = {"grep", "egrep", "head", "tail", "wc", "sort", "uniq", "cut", "jq", "yq"}
+
+
+def kubectl_verb(command: str) -> Optional[str]:
+    """Returns the verb of the kubectl command, e.g. 'get' for 'kubectl -n x get pods'."""
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if not tokens or os.path.basename(tokens[0]) not in ("kubectl", "oc"):
+        return None
+    skip = False
+    for token in tokens[1:]:
+        if skip:
+            skip = False
+        elif token in VALUE_FLAGS:
+            skip = True
+        elif not token.startswith("-"):
+            return token
+    return None
+
+
+def is_read_command(command: str) -> bool:
+    """Whether the command only reads the cluster state, optionally piped to filters."""
+    if re.search(r"[;&<>`]|\$\(", command):
+        return False
+    segments = command.split("|")
+    if kubectl_verb(segments[0]) not in READ_VERBS:
+        return False
+    for segment in segments[1:]:
+        words = segment.split()
+        if not words or words[0] not in PIPE_FILTERS:
+            return False
+    return True
+
+
+class KubectlCommand:
+    """
+    A kubectl command parsed once with shlex, so it can be resolved for many clusters
+    by injecting `--kubeconfig` and `--context` as argv entries, and exec'd without a
+    shell unless it's piped or redirected, e.g. "kubectl get pods | grep x".
+
+    Args:
+        argv (Tuple[str, ...]): The kubectl arguments without the target flags.
+        tail (str): The shell part after the kubectl arguments, e.g. "| grep x".
+        raw (str, optional): The command needing the shell expansion, e.g. "$(...)",
+            the target flags are overridden in the text instead.
+    """
+
+    __slots__ = ("argv", "tail", "raw")
+
+    def __init__(self, argv: Tuple[str, ...], tail: str = "", raw: str = None):
+        self.argv = argv
+        self.tail = tail
+        self.raw = raw
+
+    @property
+    def needs_shell(self) -> bool:
+        return bool(self.tail or self.raw)
+
+    @classmethod
+    @functools.lru_cache(maxsize=256)
+    def parse(cls, command: str) -> "KubectlCommand":
+        head, tail = cls._split_shell(command.strip())
+        if head is None:
+            return cls((), raw=command)
+
+        argv, skip = [], False
+        tokens = iter(shlex.split(head))
+        for token in tokens:
+            if skip:
+                skip = False
+            elif token == "--":
+                # the rest belongs to the command run in the container
+                argv += [token, *tokens]
+            elif TARGET_FLAG.match(token):
+                skip = TARGET_FLAG.match(token).group(2) is None
+            else:
+                argv.append(token)
+        return cls(tuple(argv), tail)
+
+    @staticmethod
+    def _split_shell(command: str) -> Tuple[Optional[str], str]:
+        """
+        Splits the command at the first unquoted shell operator, the head is None if
+        it needs the shell expansion or the quotes are unbalanced.
+        """
+        quote = None
+        for index, char in enumerate(command):
+            if quote == "'":
+                if char == "'":
+                    quote = None
+            elif char == "\\":
+                return None, ""
+            elif quote == '"':
+                if char == '"':
+                    quote = None
+                elif char in "$`":
+                    return None, ""
+            elif char in "'\"":
+                quote = char
+            elif SHELL_EXPANSION.match(char):
+                return None, ""
+            elif SHELL_OPERATOR.match(char):
+                return command[:index], command[index:]
+        if quote:
+            return None, ""
+        return command, ""
+
+    def resolve(self, kubeconfig: str = None, context: str = None) -> List[str] | str:
+        """
+        Returns the argv targeting the cluster to exec, or the command line to run in
+        a shell.
+        """
+        if self.raw is not None:
+            command = self.raw
+            if kubeconfig:
+                command = KUBECONFIG_FLAG.sub("", command)
+                command += f" --kubeconfig {shlex.quote(kubeconfig)}"
+            if context:
+                command = CONTEXT_FLAG.sub("", command)
+                command += f" --context {shlex.quote(context)}"
+            return command.strip()
+        target = []
+        if kubeconfig:
+            target += ["--kubeconfig", kubeconfig]
+        if context:
+            target += ["--context", context]
+        argv = list(self.argv)
+        # the flags after "--" belong to the command run in the container
+        index = argv.index("--") if "--" in argv else len(argv)
+        argv[index:index] = target
+        if self.tail:
+            return f"{shlex.join(argv)} {self.tail}"
+        return argv
+
 
 class ClusterConfig(BaseModel):
     """
@@ -45,19 +234,99 @@ class ClusterConfig(BaseModel):
         raise ValueError(f"Context is not provided for cluster '{self.name}'.")
 
 
+class ReadCache:
+    """
+    A short-lived LRU cache of the read command outputs per cluster, so re-checking
+    the same state within a few seconds doesn't spawn kubectl and hit the API server
+    again. A mutating command drops the entries of its cluster.
+
+    Args:
+        ttl (float): The seconds an output is reused.
+        size (int): The max outputs kept, the least recently used are evicted.
+    """
+
+    def __init__(self, ttl: float, size: int = 128):
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Tuple[str, str, str], Tuple[float, str]] = (
+            OrderedDict()
+        )
+        # kubectl_cmd might run in the worker threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(cluster_name: str, context: str, command: str) -> Tuple[str, str, str]:
+        try:
+            command = " ".join(shlex.split(command))
+        except ValueError:
+            command = " ".join(command.split())
+        return cluster_name, context or "", command
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, str, str], output: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, cluster_name: str = None):
+        """Drops the outputs of the cluster, or all of them."""
+        with self._lock:
+            if cluster_name is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == cluster_name]:
+                del self._entries[key]
+
+
 class KubectlExecutor:
     """
     A class to manage multiple Kubernetes clusters by dynamically adding
     --kubeconfig and --context options to kubectl commands.
     """
 
-    def __init__(self, default_kubeconfig: str = None, default_context: str = None):
+    def __init__(
+        self,
+        default_kubeconfig: str = None,
+        default_context: str = None,
+        max_concurrency: int = 4,
+        cache_ttl: float = 0,
+        cache_size: int = 128,
+        native_api: bool = False,
+        max_rows: int = None,
+        output_budget: int = None,
+    ):
         """
         Initialize the ClusterManager.
 
         Args:
             default_kubeconfig (str): Path to the default kubeconfig file.
             default_context (str): Default context name for the default kubeconfig.
+            max_concurrency (int): The max async commands running on a cluster at once.
+            cache_ttl (float): The seconds to reuse the output of a read command, e.g.
+                get or describe, 0 disables the cache.
+            cache_size (int): The max read command outputs cached.
+            native_api (bool): Serve the get and logs commands through the
+                pooled kubernetes API clients instead of the kubectl binary, requires
+                the kubernetes package.
+            max_rows (int): The default max rows of the table outputs.
+            output_budget (int): The max characters of an output, a get command printing
+                yaml or json over it is rerun for the column output, and the rest is
+                truncated.
         """
         self.default_kubeconfig = (
             default_kubeconfig
@@ -70,6 +339,18 @@ class KubectlExecutor:
             )
         self.default_context = default_context or None
         self._cluster_registry = {}
+        self.max_concurrency = max_concurrency
+        # bound the async commands per cluster, so an agent can query many clusters
+        # in parallel without flooding one of them
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self.cache = ReadCache(cache_ttl, cache_size) if cache_ttl > 0 else None
+        self.max_rows = max_rows
+        self.output_budget = output_budget
+        self.api_backend = None
+        if native_api:
+            from .kube_api_backend import KubeApiBackend
+
+            self.api_backend = KubeApiBackend()
 
     def register_cluster(self, cluster: ClusterConfig):
         """
@@ -82,7 +363,11 @@ class KubectlExecutor:
 
     @classmethod
     def from_yaml(
-        cls, yaml_path: str, default_kubeconfig: str = None, default_context: str = None
+        cls,
+        yaml_path: str,
+        default_kubeconfig: str = None,
+        default_context: str = None,
+        **kwargs,
     ):
         """
         Create a MultiKubeConfig instance from a YAML file.
@@ -91,6 +376,7 @@ class KubectlExecutor:
             yaml_path (str): Path to the YAML file containing cluster configurations.
             default_kubeconfig (str): Path to the default kubeconfig file.
             default_context (str): Default context name for the default kubeconfig.
+            kwargs: The other options of the executor, e.g. max_concurrency.
 
         Returns:
             MultiKubeConfig: An instance of MultiKubeConfig initialized with the clusters from the YAML file.
@@ -106,7 +392,9 @@ class KubectlExecutor:
             raise ValueError("Invalid YAML format: 'clusters' must be a list.")
 
         instance = cls(
-            default_kubeconfig=default_kubeconfig, default_context=default_context
+            default_kubeconfig=default_kubeconfig,
+            default_context=default_context,
+            **kwargs,
         )
 
         for cluster_data in clusters:
@@ -121,12 +409,17 @@ class KubectlExecutor:
 
         return instance
 
+    @side_effect_free(when=lambda args: is_read_command(args.get("command", "")))
     def kubectl_cmd(
         self,
         cluster_name: str,
         command: str,
         input: str = None,
         timeout: float = 10,
+        columns: str = None,
+        max_rows: int = None,
+        unhealthy_only: bool = False,
+        summary: bool = False,
     ) -> str:
         """
         Run the kubectl command within the specified cluster and return the final output.
@@ -136,6 +429,10 @@ class KubectlExecutor:
           command (str): The kubectl command to execute (e.g., "kubectl get pods").
           input: Input to be passed to the command (str or bytes). Useful for commands like `apply -f -`.
           timeout (int): Timeout for the command execution in seconds.
+          columns (str): The comma separated columns of the table output to keep (e.g., "NAME,STATUS").
+          max_rows (int): The max rows of the table output to return.
+          unhealthy_only (bool): Return only the rows not Running/Completed or not ready (e.g., failing pods).
+          summary (bool): Return the row counts per status and namespace instead of the rows.
 
         Returns:
             str: The output of the command execution.
@@ -167,28 +464,361 @@ class KubectlExecutor:
 
             4. Use a timeout to limit execution:
                 output = kubectl_command("cluster1", "kubectl get pods -n default", timeout=10)
+
+            5. List the failing pods only:
+                output = kubectl_command("cluster1", "kubectl get pods -A", unhealthy_only=True)
         """
-        cluster_config: ClusterConfig = self._cluster_registry.get(cluster_name, None)
-        # Use cluster-specific configuration or fallback to default
-        kubeconfig = (
-            cluster_config.kubeconfig if cluster_config else self.default_kubeconfig
-        )
-        context = cluster_config.context if cluster_config else self.default_context
-        adapt_kubectl = self.override_kubectl_command(command, kubeconfig, context)
+        output = self._run_command(cluster_name, command, input, timeout)
+        rewritten = self._rewrite_over_budget(command, output)
+        if rewritten:
+            output = rewritten[1] + self._run_command(
+                cluster_name, rewritten[0], input, timeout
+            )
+        return self._shape(output, columns, max_rows, unhealthy_only, summary)
+
+    def _run_command(
+        self, cluster_name: str, command: str, input: str, timeout: float
+    ) -> str:
+        target = self.cluster_command(cluster_name, command)
+        adapt_kubectl = target if isinstance(target, str) else shlex.join(target)
+        cache_key, output = self._cached(cluster_name, command, input)
+        if output is not None:
+            return output
+        result = self._run_native(cluster_name, command, input, timeout)
+        if result is not None:
+            code, output = result
+            if code != 0:
+                return f"{adapt_kubectl}: \n{output}"
+            if cache_key:
+                self.cache.put(cache_key, output)
+            return output
         try:
             output = subprocess.run(
-                adapt_kubectl,
-                shell=True,
+                target,
+                shell=isinstance(target, str),
                 check=True,
-                input=input,
+                input=input.encode() if isinstance(input, str) else input,
                 timeout=float(timeout),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
             ).stdout.decode()
         except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as error:
-            return f"{adapt_kubectl}: \n{error.stdout.decode()}"
+            return f"{adapt_kubectl}: \n{(error.stdout or b'').decode()}"
+        except OSError as error:
+            return f"{adapt_kubectl}: \n{error}"
+        if cache_key:
+            self.cache.put(cache_key, output)
+        return output
+
+    @side_effect_free(when=lambda args: is_read_command(args.get("command", "")))
+    async def akubectl_cmd(
+        self,
+        cluster_name: str,
+        command: str,
+        input: str = None,
+        timeout: float = 10,
+        columns: str = None,
+        max_rows: int = None,
+        unhealthy_only: bool = False,
+        summary: bool = False,
+    ) -> str:
+        output = await self._arun_command(cluster_name, command, input, timeout)
+        rewritten = self._rewrite_over_budget(command, output)
+        if rewritten:
+            output = rewritten[1] + await self._arun_command(
+                cluster_name, rewritten[0], input, timeout
+            )
+        return self._shape(output, columns, max_rows, unhealthy_only, summary)
+
+    akubectl_cmd.__doc__ = kubectl_cmd.__doc__
+
+    async def _arun_command(
+        self, cluster_name: str, command: str, input: str, timeout: float
+    ) -> str:
+        target = self.cluster_command(cluster_name, command)
+        adapt_kubectl = target if isinstance(target, str) else shlex.join(target)
+        code, output = await self._arun(cluster_name, command, target, input, timeout)
+        if code != 0:
+            return f"{adapt_kubectl}: \n{output}"
+        return output
+
+    def _rewrite_over_budget(
+        self, command: str, output: str
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Rewrites the get command printing yaml or json over the output budget into the
+        column output.
+
+        Returns:
+            Optional[Tuple[str, str]]: The rewritten command and the note to prepend.
+        """
+        if not self.output_budget or len(output) <= self.output_budget:
+            return None
+        # the structured output piped or redirected is consumed, e.g. by jq
+        if KubectlCommand.parse(command).needs_shell or kubectl_verb(command) != "get":
+            return None
+        output_format = structured_output(command)
+        rewritten, changed = rewrite_to_columns(command)
+        if not changed:
+            return None
+        note = (
+            f"[the {output_format} output is {len(output)} characters, over the budget "
+            f"of {self.output_budget}, showing the columns of `{rewritten}` instead]\n"
+        )
+        return rewritten, note
+
+    def _shape(
+        self,
+        output: str,
+        columns: str,
+        max_rows: int,
+        unhealthy_only: bool,
+        summary: bool,
+    ) -> str:
+        output = shape_output(
+            output,
+            columns=columns,
+            max_rows=max_rows or self.max_rows,
+            unhealthy_only=unhealthy_only,
+            summary=summary,
+        )
+        if self.output_budget and len(output) > self.output_budget:
+            truncated = len(output) - self.output_budget
+            output = (
+                output[: self.output_budget]
+                + f"\n... [{truncated} characters truncated, narrow down the query or "
+                "use columns, max_rows, unhealthy_only or summary]"
+            )
         return output
 
+    @side_effect_free(when=lambda args: is_read_command(args.get("command", "")))
+    async def kubectl_fanout(
+        self,
+        command: str,
+        cluster_names: str = None,
+        timeout: float = 10,
+    ) -> str:
+        """
+        Run the same kubectl command against many clusters concurrently and return a
+        compact table of the results, instead of calling kubectl_cmd once per cluster.
+
+        Args:
+          command (str): The kubectl command to execute (e.g., "kubectl get pods -A | grep -v Running").
+          cluster_names (str): The comma-separated names of the clusters to run it on, all the registered clusters by default.
+          timeout (int): Timeout for the command execution on each cluster in seconds.
+
+        Returns:
+            str: The output lines prefixed by the cluster name, followed by the failed clusters.
+
+        Examples:
+            1. Find the failing pods across the fleet:
+                output = kubectl_fanout("kubectl get pods -A --field-selector=status.phase!=Running")
+
+            2. Check a deployment on some clusters:
+                output = kubectl_fanout("kubectl get deploy nginx -n default", "cluster1,cluster2")
+        """
+        if isinstance(cluster_names, str):
+            cluster_names = [
+                name.strip() for name in cluster_names.split(",") if name.strip()
+            ]
+        cluster_names = cluster_names or list(self._cluster_registry) or ["default"]
+        # the unregistered names would run on the default cluster under their name
+        unknown = {
+            name: (1, f"unknown cluster '{name}', see list_clusters")
+            for name in cluster_names
+            if name not in self._cluster_registry and name != "default"
+        }
+
+        targets = self.cluster_commands(
+            command, [name for name in cluster_names if name not in unknown]
+        )
+        results = await asyncio.gather(
+            *(
+                self._arun(name, command, target, None, timeout)
+                for name, target in targets.items()
+            )
+        )
+        results = dict(zip(targets, results))
+        results = {
+            name: unknown[name] if name in unknown else results[name]
+            for name in dict.fromkeys(cluster_names)
+        }
+        return self.fanout_table(results, shape=self._shape_fanout)
+
+    def _shape_fanout(self, output: str) -> str:
+        return self._shape(output, None, None, False, False)
+
+    @staticmethod
+    def fanout_table(results: dict, shape: Callable[[str], str] = None) -> str:
+        """
+        Merges the outputs of the clusters into one table with a leading CLUSTER column,
+        realigned, when the clusters print tables of the same columns, otherwise the
+        output lines are prefixed by the cluster name. The merged output is shaped, e.g.
+        by the row and output budget, ahead of the failed clusters.
+        """
+        width = max(len("CLUSTER"), *(len(name) for name in results))
+        outputs = {
+            name: output.strip()
+            for name, (code, output) in results.items()
+            if code == 0
+        }
+        empty = [name for name, output in outputs.items() if not output]
+        # kubectl pads the columns to the widths of each cluster, so compare the names
+        tables = {
+            name: Table.parse(output) for name, output in outputs.items() if output
+        }
+        columns = {tuple(table.columns) for table in tables.values() if table}
+
+        rows = []
+        if tables and len(columns) == 1 and all(tables.values()):
+            merged = Table(
+                ["CLUSTER", *columns.pop()],
+                [[name, *row] for name, table in tables.items() for row in table.rows],
+            )
+            empty += [name for name, table in tables.items() if not table.rows]
+            if merged.rows:
+                rows.append(merged.format())
+        else:
+            for name in tables:
+                rows.extend(
+                    f"{name:<{width}}  {line}" for line in outputs[name].splitlines()
+                )
+        if rows and shape:
+            rows = [shape("\n".join(rows))]
+
+        failed = [
+            f"{name:<{width}}  {' '.join(output.split())[:200] or f'exit code {code}'}"
+            for name, (code, output) in results.items()
+            if code != 0
+        ]
+        if empty:
+            rows.append(f"No output: {', '.join(empty)}")
+        if failed:
+            rows.append(f"Failed ({len(failed)}/{len(results)}):")
+            rows.extend(failed)
+        return "\n".join(rows)
+
+    async def _arun(
+        self,
+        cluster_name: str,
+        command: str,
+        target: List[str] | str,
+        input: str,
+        timeout: float,
+    ) -> Tuple[Optional[int], str]:
+        """
+        Runs the adapted command without blocking the event loop, the argv is exec'd
+        directly, while the command line runs in a shell.
+
+        Returns:
+            Tuple[Optional[int], str]: The exit code, None on timeout, and the output.
+        """
+        cache_key, output = self._cached(cluster_name, command, input)
+        if output is not None:
+            return 0, output
+        semaphore = self._semaphores.setdefault(
+            cluster_name, asyncio.Semaphore(self.max_concurrency)
+        )
+        async with semaphore:
+            if self.api_backend is not None:
+                result = await asyncio.to_thread(
+                    self._run_native, cluster_name, command, input, timeout
+                )
+                if result is not None:
+                    if cache_key and result[0] == 0:
+                        self.cache.put(cache_key, result[1])
+                    return result
+            pipes = dict(
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            try:
+                if isinstance(target, str):
+                    process = await asyncio.create_subprocess_shell(target, **pipes)
+                else:
+                    process = await asyncio.create_subprocess_exec(*target, **pipes)
+            except OSError as error:
+                return 127, str(error)
+            try:
+                stdout, _ = await asyncio.wait_for(
+                    process.communicate(input.encode() if input else None),
+                    timeout=float(timeout),
+                )
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return None, f"timed out after {timeout} seconds"
+        output = stdout.decode()
+        if cache_key and process.returncode == 0:
+            self.cache.put(cache_key, output)
+        return process.returncode, output
+
+    def _run_native(
+        self, cluster_name: str, command: str, input: str, timeout: float = None
+    ) -> Optional[Tuple[int, str]]:
+        """Runs the read command through the API backend, None if it isn't served."""
+        if self.api_backend is None or input is not None:
+            return None
+        if KubectlCommand.parse(command).needs_shell:
+            return None
+        kubeconfig, context = self.cluster_target(cluster_name)
+        return self.api_backend.run(
+            kubeconfig, context, command, float(timeout) if timeout else None
+        )
+
+    def _cached(
+        self, cluster_name: str, command: str, input: str
+    ) -> Tuple[Optional[Tuple[str, str, str]], Optional[str]]:
+        """
+        Looks up the read command in the cache, a mutating command invalidates the
+        outputs of the cluster instead.
+
+        Returns:
+            Tuple: The cache key to store the output, None if it isn't cacheable, and
+                the cached output, None on miss.
+        """
+        if self.cache is None:
+            return None, None
+        if not is_read_command(command):
+            # any part of a chained command might mutate, e.g. "get x; delete y"
+            self.cache.invalidate(cluster_name)
+            return None, None
+        if input is not None:
+            return None, None
+        _, context = self.cluster_target(cluster_name)
+        key = self.cache.key(cluster_name, context, command)
+        return key, self.cache.get(key)
+
+    def cluster_target(self, cluster_name: str) -> Tuple[str, Optional[str]]:
+        """Returns the kubeconfig and context of the cluster."""
+        cluster_config: ClusterConfig = self._cluster_registry.get(cluster_name, None)
+        # Use cluster-specific configuration or fallback to default
+        kubeconfig = (
+            cluster_config.kubeconfig if cluster_config else self.default_kubeconfig
+        )
+        context = cluster_config.context if cluster_config else self.default_context
+        return kubeconfig, context
+
+    def cluster_command(self, cluster_name: str, command: str) -> List[str] | str:
+        """
+        Adapts the command to the kubeconfig and context of the cluster.
+
+        Returns:
+            List[str] | str: The argv to exec, or the command line needing a shell.
+        """
+        kubeconfig, context = self.cluster_target(cluster_name)
+        return KubectlCommand.parse(command).resolve(kubeconfig, context)
+
+    def cluster_commands(
+        self, command: str, cluster_names: List[str]
+    ) -> Dict[str, List[str] | str]:
+        """Adapts the command to many clusters, it's parsed only once."""
+        parsed = KubectlCommand.parse(command)
+        return {
+            name: parsed.resolve(*self.cluster_target(name)) for name in cluster_names
+        }
+
     def list_clusters(self):
         """
         List all registered clusters.
@@ -242,11 +872,11 @@ class KubectlExecutor:
         """
 
         if kubeconfig:
-            kubectl_command = re.sub(r"--kubeconfig\s+\S+", "", kubectl_command)
+            kubectl_command = KUBECONFIG_FLAG.sub("", kubectl_command)
             kubectl_command += f" --kubeconfig {kubeconfig}"
 
         if context:
-            kubectl_command = re.sub(r"--context\s+\S+", "", kubectl_command)
+            kubectl_command = CONTEXT_FLAG.sub("", kubectl_command)
             kubectl_command += f" --context {context}"
 
         return kubectl_command.strip()
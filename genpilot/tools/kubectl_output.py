@@ -0,0 +1,140 @@
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+# the header cells of the kubectl tables are separated by 2+ spaces, while a cell
+# might contain a single one, e.g. "NOMINATED NODE"
+HEADER_CELL = re.compile(r"\S+(?: \S+)*")
+OUTPUT_FLAG = re.compile(r"(?:-o|--output)(?:\s+|=)?(yaml|json)\b")
+HEALTHY_STATUS = {"Running", "Completed", "Succeeded", "Active", "Bound", "Ready"}
+READY = re.compile(r"^(\d+)/(\d+)$")
+
+
+class Table:
+    """A kubectl table output, the rows are split at the header column offsets."""
+
+    def __init__(self, columns: List[str], rows: List[List[str]]):
+        self.columns = columns
+        self.rows = rows
+
+    @classmethod
+    def parse(cls, output: str) -> Optional["Table"]:
+        lines = [line for line in output.splitlines() if line.strip()]
+        if not lines:
+            return None
+        cells = list(HEADER_CELL.finditer(lines[0]))
+        if not cells or any(not cell.group().isupper() for cell in cells):
+            return None
+        starts = [cell.start() for cell in cells] + [None]
+        rows = [
+            [line[start:end].strip() for start, end in zip(starts, starts[1:])]
+            for line in lines[1:]
+        ]
+        return cls([cell.group() for cell in cells], rows)
+
+    def column(self, name: str) -> Optional[int]:
+        return self.columns.index(name) if name in self.columns else None
+
+    def select(self, names: List[str]) -> "Table":
+        """Keeps the given columns, in the given order, ignoring the unknown ones."""
+        indexes = [self.column(name.upper()) for name in names]
+        indexes = [index for index in indexes if index is not None] or list(
+            range(len(self.columns))
+        )
+        return Table(
+            [self.columns[i] for i in indexes],
+            [[row[i] for i in indexes] for row in self.rows],
+        )
+
+    def unhealthy(self) -> "Table":
+        """Keeps the rows not Running or Completed, or not ready, e.g. 1/2."""
+        status, ready = self.column("STATUS"), self.column("READY")
+
+        def is_unhealthy(row):
+            if status is not None and row[status] not in HEALTHY_STATUS:
+                return True
+            match = READY.match(row[ready]) if ready is not None else None
+            return bool(
+                match
+                and match.group(1) != match.group(2)
+                and (status is None or row[status] != "Completed")
+            )
+
+        return Table(self.columns, [row for row in self.rows if is_unhealthy(row)])
+
+    def summary(self) -> str:
+        """The row count along with the counts per status and namespace."""
+        lines = [f"{len(self.rows)} {'row' if len(self.rows) == 1 else 'rows'}"]
+        for name in ("STATUS", "NAMESPACE"):
+            index = self.column(name)
+            if index is None:
+                continue
+            counts = Counter(row[index] for row in self.rows)
+            lines.append(
+                f"{name}: "
+                + ", ".join(f"{key}={count}" for key, count in counts.most_common())
+            )
+        return "\n".join(lines)
+
+    def format(self, max_rows: int = None) -> str:
+        rows = self.rows if max_rows is None else self.rows[:max_rows]
+        lines = [self.columns] + rows
+        widths = [max(len(cell) for cell in column) for column in zip(*lines)]
+        text = "\n".join(
+            "   ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+            for line in lines
+        )
+        if len(rows) < len(self.rows):
+            text += f"\n... {len(self.rows) - len(rows)} more rows"
+        return text
+
+
+def shape_output(
+    output: str,
+    columns: str = None,
+    max_rows: int = None,
+    unhealthy_only: bool = False,
+    summary: bool = False,
+) -> str:
+    """
+    Shapes the kubectl table output before it goes into the memory, the other outputs,
+    e.g. yaml, are returned as is.
+
+    Args:
+        output (str): The output of the command.
+        columns (str): The comma separated columns to keep, e.g. "NAME,STATUS".
+        max_rows (int): The max rows to keep.
+        unhealthy_only (bool): Keep only the rows not Running, Completed or ready.
+        summary (bool): Return the counts per status and namespace instead of rows.
+    """
+    if not (columns or max_rows or unhealthy_only or summary):
+        return output
+    table = Table.parse(output)
+    if table is None:
+        return output
+    if unhealthy_only:
+        table = table.unhealthy()
+        if not table.rows:
+            return "No unhealthy resources found"
+    if summary:
+        return table.summary()
+    if columns:
+        table = table.select([name.strip() for name in columns.split(",")])
+    return table.format(max_rows)
+
+
+def structured_output(command: str) -> Optional[str]:
+    """Returns the yaml or json output format of the command, if any."""
+    match = OUTPUT_FLAG.search(command)
+    return match.group(1) if match else None
+
+
+def rewrite_to_columns(command: str) -> Tuple[str, bool]:
+    """
+    Rewrites the yaml or json output of the command into the wide column output.
+
+    Returns:
+        Tuple[str, bool]: The command and whether it's rewritten.
+    """
+    rewritten = OUTPUT_FLAG.sub("-o wide", command)
+    return rewritten, rewritten != command
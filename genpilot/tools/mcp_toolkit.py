@@ -1,15 +1,27 @@
 from pydantic import BaseModel, model_validator
 from mcp import StdioServerParameters, types, ClientSession
-from typing import Optional, List
+from typing import Dict, Optional, List
+
+from genpilot.mcp.result_cache import tool_cache_ttl
+from genpilot.mcp.transport import ServerParameters
+from genpilot.mcp.tool_result import DEFAULT_MAX_RESULT_BYTES, tool_result_budget
 
 
 class McpToolkit(BaseModel):
     name: str
-    server_param: StdioServerParameters
+    server_param: ServerParameters
     exclude_tools: list[str] = []
     session: Optional[ClientSession] = None
     tools: List[types.Tool] = []
     tool_schemas: List[dict] = []
+    # seconds taken to start and initialize the server
+    startup_time: float = 0.0
+    # seconds to cache the tool results by name, and of the read-only annotated tools
+    cache_tools: Dict[str, float] = {}
+    cache_ttl: float = 0
+    # the max bytes of a tool result kept in the memory, by tool name and by default
+    result_budgets: Dict[str, int] = {}
+    max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES
 
     class Config:
         arbitrary_types_allowed = True  # Allow arbitrary types like ClientSession
@@ -30,3 +42,20 @@ class McpToolkit(BaseModel):
         ]
         values["tool_schemas"] = tool_schemas
         return values
+
+    def tool(self, tool_name: str) -> Optional[types.Tool]:
+        return next((tool for tool in self.tools if tool.name == tool_name), None)
+
+    def is_read_only(self, tool_name: str) -> bool:
+        """Whether the tool is annotated as read-only by the server."""
+        tool = self.tool(tool_name)
+        annotations = getattr(tool, "annotations", None)
+        return bool(annotations and getattr(annotations, "readOnlyHint", None))
+
+    def result_cache_ttl(self, tool_name: str) -> float:
+        """The seconds to cache the results of the tool, 0 means not cacheable."""
+        return tool_cache_ttl(self.tool(tool_name), self.cache_tools, self.cache_ttl)
+
+    def result_budget(self, tool_name: str) -> int:
+        """The max bytes of the tool result kept in the memory, 0 means unbounded."""
+        return tool_result_budget(tool_name, self.result_budgets, self.max_result_bytes)
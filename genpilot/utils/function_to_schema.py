@@ -1,4 +1,7 @@
+import copy
+import functools
 import inspect
+import weakref
 from openai.types.chat import ChatCompletionToolParam
 from openai.types import FunctionDefinition, FunctionParameters
 from typing import Tuple, get_type_hints
@@ -15,7 +18,33 @@ json_type_mapping = {
 }
 
 
+def memoize_by_function(convert):
+    """
+    Caches the schema per function for the whole process, so the same tools shared by
+    many agents are inspected once. The functions are held weakly, keyed by the
+    underlying function of a bound method, so the cache doesn't keep the closures or
+    the instances alive, and every call returns a copy of the cached schema.
+    """
+    # the schemas of the function, by whether it's bound
+    schemas = weakref.WeakKeyDictionary()
+
+    @functools.wraps(convert)
+    def wrapper(func):
+        bound = hasattr(func, "__self__") and hasattr(func, "__func__")
+        try:
+            cached = schemas.setdefault(getattr(func, "__func__", func), {})
+        except TypeError:  # unhashable or not weakly referenceable
+            return convert(func)
+        if bound not in cached:
+            cached[bound] = convert(func)
+        return copy.deepcopy(cached[bound])
+
+    wrapper.cache_clear = schemas.clear
+    return wrapper
+
+
 # https://cookbook.openai.com/examples/orchestrating_agents#executing-routines
+@memoize_by_function
 def function_to_schema(func) -> dict:
     try:
         signature = inspect.signature(func)
@@ -57,6 +86,7 @@ def function_to_schema(func) -> dict:
 # https://cookbook.openai.com/examples/orchestrating_agents#executing-routines
 # https://openai.com/index/function-calling-and-other-api-updates/
 # https://docs.llama-api.com/essentials/function
+@memoize_by_function
 def func_to_param(func) -> ChatCompletionToolParam:
     try:
         parameters = inspect.signature(func).parameters
@@ -5,6 +5,14 @@ import commentjson
 from typing import Dict, List, Optional
 from mcp import StdioServerParameters, types, ClientSession
 from pydantic import BaseModel
+from genpilot.mcp.session import DEFAULT_STARTUP_TIMEOUT
+from genpilot.mcp.transport import (
+    RemoteServerParameters,
+    ServerParameters,
+    remote_transport,
+)
+from genpilot.mcp.result_cache import cache_tools_config
+from genpilot.mcp.tool_result import DEFAULT_MAX_RESULT_BYTES
 
 
 class McpServerConfig(BaseModel):
@@ -15,37 +23,83 @@ class McpServerConfig(BaseModel):
 
     Attributes:
         server_name (str): The name identifier for this MCP server
-        server_param (StdioServerParameters): Connection parameters for the server, including
-            command, arguments and environment variables
+        server_param (ServerParameters): Connection parameters for the server, including
+            command, arguments and environment variables, or the url of a remote server
         exclude_tools (list[str]): List of tool names to exclude from this server
+        startup_timeout (float): Seconds to wait for the server to start and initialize
+        cache_tools (dict[str, float]): Seconds to cache the results of a tool, by name
+        cache_ttl (float): Seconds to cache the results of the read-only annotated tools
+        result_budgets (dict[str, int]): Max bytes of a tool result kept, by name
+        max_result_bytes (int): Max bytes of the other tool results kept, 0 is unbounded
     """
 
     server_name: str
-    server_param: StdioServerParameters
+    server_param: ServerParameters
     exclude_tools: list[str] = []
+    startup_timeout: float = DEFAULT_STARTUP_TIMEOUT
+    cache_tools: dict[str, float] = {}
+    cache_ttl: float = 0
+    result_budgets: dict[str, int] = {}
+    max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES
 
 
 @dataclass
 class ServerConfig:
-    """Configuration for an MCP server."""
+    """Configuration for an MCP server, either a stdio command or a remote url."""
 
-    command: str
+    command: str = None
     args: List[str] = None
     env: Dict[str, str] = None
     enabled: bool = True
     exclude_tools: List[str] = None
     requires_confirmation: List[str] = None
+    startup_timeout: float = DEFAULT_STARTUP_TIMEOUT
+    cache_tools: Dict[str, float] = None
+    cache_ttl: float = 0
+    # the max bytes of a tool result kept in the memory, by tool name and by default
+    result_budgets: Dict[str, int] = None
+    max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES
+    # the remote server over SSE or streamable HTTP
+    url: str = None
+    transport: str = None
+    headers: Dict[str, str] = None
 
     @classmethod
     def from_dict(cls, config: dict) -> "ServerConfig":
         """Create ServerConfig from dictionary."""
+        if "command" not in config and "url" not in config:
+            raise ValueError("MCP server config requires either 'command' or 'url'")
         return cls(
-            command=config["command"],
+            command=config.get("command"),
             args=config.get("args", []),
             env=config.get("env", {}),
             enabled=config.get("enabled", True),
             exclude_tools=config.get("exclude_tools", []),
             requires_confirmation=config.get("requires_confirmation", []),
+            startup_timeout=config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT),
+            cache_tools=cache_tools_config(
+                config.get("cache_tools", {}), config.get("cache_ttl", 0)
+            ),
+            cache_ttl=config.get("cache_ttl", 0),
+            result_budgets=config.get("result_budgets", {}),
+            max_result_bytes=config.get("max_result_bytes", DEFAULT_MAX_RESULT_BYTES),
+            url=config.get("url"),
+            transport=config.get("transport"),
+            headers=config.get("headers", {}),
+        )
+
+    def server_params(self) -> ServerParameters:
+        """The parameters to start the stdio server, or to connect to the remote one."""
+        if self.url:
+            return RemoteServerParameters(
+                url=self.url,
+                transport=remote_transport(self.url, self.transport),
+                headers=self.headers or {},
+            )
+        return StdioServerParameters(
+            command=self.command,
+            args=self.args or [],
+            env={**(self.env or {}), **os.environ},
         )
 
 
@@ -91,12 +145,13 @@ class AppConfig:
         return [
             McpServerConfig(
                 server_name=name,
-                server_param=StdioServerParameters(
-                    command=config.command,
-                    args=config.args or [],
-                    env={**(config.env or {}), **os.environ},
-                ),
+                server_param=config.server_params(),
                 exclude_tools=config.exclude_tools or [],
+                startup_timeout=config.startup_timeout,
+                cache_tools=config.cache_tools or {},
+                cache_ttl=config.cache_ttl,
+                result_budgets=config.result_budgets or {},
+                max_result_bytes=config.max_result_bytes,
             )
             for name, config in self.get_enabled_servers().items()
         ]
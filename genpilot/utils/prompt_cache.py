@@ -0,0 +1,58 @@
+from typing import List, Tuple
+
+# providers caching the prompt prefix only up to the explicit breakpoints, the others
+# (openai, deepseek, ...) cache the stable prefix automatically
+CACHE_CONTROL_PROVIDERS = {"anthropic", "bedrock", "vertex_ai", "vertex_ai_beta"}
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def supports_cache_control(model: str) -> bool:
+    import litellm
+
+    try:
+        _, provider, _, _ = litellm.get_llm_provider(model)
+    except Exception:
+        return False
+    return provider in CACHE_CONTROL_PROVIDERS
+
+
+def with_cache_control(message: dict) -> dict:
+    """Returns a copy of the message with a cache breakpoint on its last content block."""
+    content = message.get("content")
+    if not content:
+        return message
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    content = [dict(block) for block in content]
+    content[-1]["cache_control"] = CACHE_CONTROL
+    return {**message, "content": content}
+
+
+def cache_breakpoints(
+    model: str, messages: List[dict], tool_schemas: List[dict]
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Places the prompt cache breakpoints for the providers supporting them: after the
+    tool schemas, after the system prompt, which are the stable prefix of every
+    request, and after the latest message, so the next request can reuse the history.
+    The messages and tool schemas in memory are left untouched.
+
+    Returns:
+        Tuple[List[dict], List[dict]]: The messages and the tool schemas to request.
+    """
+    if not supports_cache_control(model) or not messages:
+        return messages, tool_schemas
+
+    if tool_schemas:
+        tool_schemas = [
+            *tool_schemas[:-1],
+            {**tool_schemas[-1], "cache_control": CACHE_CONTROL},
+        ]
+
+    messages = list(messages)
+    if messages[0]["role"] == "system":
+        messages[0] = with_cache_control(messages[0])
+    if len(messages) > 1:
+        messages[-1] = with_cache_control(messages[-1])
+    return messages, tool_schemas
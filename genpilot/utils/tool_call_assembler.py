@@ -0,0 +1,110 @@
+import json
+from typing import Dict, List
+
+from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+
+
+class ToolCallAssembler:
+    """
+    Assembles the streamed tool call deltas into the complete tool calls.
+
+    The deltas are merged by their `index`: the first fragment of a call carries the
+    id and name, the following ones the pieces of the arguments JSON. A call is
+    complete once its arguments parse as a JSON object, or once the next call starts,
+    so it can be acted on before the rest of the stream finishes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, dict] = {}
+        self._completed: Dict[int, ChatCompletionMessageToolCall] = {}
+
+    def add(self, delta_tool_calls) -> List[ChatCompletionMessageToolCall]:
+        """
+        Merges the tool call deltas of a chunk.
+
+        Returns:
+            List[ChatCompletionMessageToolCall]: The calls completed by these deltas.
+        """
+        completed = []
+        for delta in delta_tool_calls:
+            index = self._index(delta)
+            call = self._calls.get(index)
+            if call is None:
+                # the previous calls are finished once a new one starts
+                completed.extend(self._complete_before(index))
+                call = self._calls[index] = {
+                    "id": None,
+                    "type": "function",
+                    "name": "",
+                    "arguments": [],
+                }
+            if delta.id:
+                call["id"] = delta.id
+            if getattr(delta, "type", None):
+                call["type"] = delta.type
+            function = delta.function
+            if function is not None:
+                if function.name:
+                    call["name"] = function.name
+                if function.arguments:
+                    call["arguments"].append(function.arguments)
+
+            if index not in self._completed and self._is_complete(call):
+                completed.append(self._complete(index))
+        return completed
+
+    def finish(self) -> List[ChatCompletionMessageToolCall]:
+        """
+        Completes the remaining calls at the end of the stream.
+
+        Returns:
+            List[ChatCompletionMessageToolCall]: The calls completed by the end.
+        """
+        return self._complete_before(None)
+
+    @property
+    def tool_calls(self) -> List[ChatCompletionMessageToolCall]:
+        """The completed tool calls in the index order."""
+        return [self._completed[index] for index in sorted(self._completed)]
+
+    def _index(self, delta) -> int:
+        index = getattr(delta, "index", None)
+        if index is not None:
+            return index
+        # without index, a new id starts a new call
+        last = max(self._calls, default=None)
+        if last is None or (delta.id and delta.id != self._calls[last]["id"]):
+            return 0 if last is None else last + 1
+        return last
+
+    def _complete_before(self, index) -> List[ChatCompletionMessageToolCall]:
+        return [
+            self._complete(i)
+            for i in sorted(self._calls)
+            if i not in self._completed and (index is None or i < index)
+        ]
+
+    @staticmethod
+    def _is_complete(call: dict) -> bool:
+        if not call["name"] or not call["arguments"]:
+            return False
+        # cheap check before parsing the whole arguments
+        if not call["arguments"][-1].rstrip().endswith("}"):
+            return False
+        try:
+            return isinstance(json.loads("".join(call["arguments"])), dict)
+        except ValueError:
+            return False
+
+    def _complete(self, index: int) -> ChatCompletionMessageToolCall:
+        call = self._calls[index]
+        tool_call = ChatCompletionMessageToolCall(
+            id=call["id"] or f"call_{index}",
+            function=Function(
+                name=call["name"], arguments="".join(call["arguments"]) or "{}"
+            ),
+            type=call["type"],
+        )
+        self._completed[index] = tool_call
+        return tool_call
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Usage:
+    python samples/benchmark/import_time.py [budget_seconds]
+
+Description:
+    Measures the cold `import genpilot` in fresh interpreters and exits with 1 if the
+    best of the runs goes over the budget (default 0.5s, or GENPILOT_IMPORT_BUDGET),
+    e.g. when a front-end or litellm is imported eagerly again.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+RUNS = 5
+
+
+def cold_import_time(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    budget = float(
+        sys.argv[1] if len(sys.argv) > 1 else os.getenv("GENPILOT_IMPORT_BUDGET", 0.5)
+    )
+
+    # the interpreter startup itself isn't part of the import cost
+    baseline = min(cold_import_time("sys") for _ in range(RUNS))
+    elapsed = min(cold_import_time("genpilot") for _ in range(RUNS)) - baseline
+
+    # the modules loaded by `import genpilot`, which shouldn't include the heavy ones
+    loaded = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, genpilot; print(' '.join(sorted(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    heavy = sorted(
+        {
+            name.split(".")[0]
+            for name in loaded
+            if name.split(".")[0]
+            in ("litellm", "streamlit", "chainlit", "mcp", "openai", "rich")
+        }
+    )
+
+    print(f"import genpilot: {elapsed:.3f}s (budget {budget:.3f}s)")
+    if heavy:
+        print(f"eagerly imported: {', '.join(heavy)}")
+    if elapsed > budget or heavy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()